@@ -8,15 +8,30 @@ Aplikácia na evidenciu účasti na tréningoch
 import streamlit as st
 import gspread
 from google.oauth2.service_account import Credentials
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import pandas as pd
 import json
 from urllib.parse import unquote, quote
 import qrcode
 import zipfile
 import io
-import base64
 import hashlib
+import hmac
+import logging
+import threading
+import time as time_module
+import os
+import csv
+import tempfile
+import bisect
+import itertools
+import cProfile
+import sqlite3
+import socket
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+import unicodedata
+from collections import OrderedDict, deque
 
 # Konfigurácia stránky
 st.set_page_config(
@@ -25,30 +40,6 @@ st.set_page_config(
     layout="centered"
 )
 
-# Štýly
-st.markdown("""
-<style>
-    .big-number {
-        font-size: 72px;
-        font-weight: bold;
-        text-align: center;
-        color: #FF4B4B;
-    }
-    .subtitle {
-        font-size: 24px;
-        text-align: center;
-        color: #666;
-    }
-    .success-box {
-        padding: 20px;
-        border-radius: 10px;
-        background-color: #D4EDDA;
-        border: 1px solid #C3E6CB;
-        text-align: center;
-    }
-</style>
-""", unsafe_allow_html=True)
-
 # Typy členstva
 MEMBERSHIP_TYPES = [
     "Skúšobný tréning",
@@ -64,82 +55,482 @@ TRAINING_TIMES = [
     "18:30"
 ]
 
+# Katalógy ako množiny - kontrola parametrov okamžitého prihlásenia (auto=1)
+MEMBERSHIP_SET = frozenset(MEMBERSHIP_TYPES)
+TRAINING_TIME_SET = frozenset(TRAINING_TIMES)
+
 # Heslo pre trénerskú časť
 TRAINER_PASSWORD = "supernova"
 
+# Hlavička denného hárku
+SHEET_HEADER = ['Čas', 'Meno', 'Typ členstva', 'Čas tréningu', 'Poznámka']
+
+# Pôvodné názvy stĺpcov → aktuálne (čitatelia ich premenujú, kým hárok
+# neprevedie migrate_schema.py)
+LEGACY_COLUMNS = {'Tréning': 'Čas tréningu'}
+
+# Verzia schémy denného hárku - zapisuje sa ako developer metadata hárku,
+# staršie hárky prevedie migrate_schema.py (čitatelia predpokladajú SHEET_HEADER)
+SCHEMA_VERSION = 1
+SCHEMA_METADATA_KEY = "giantgym_schema"
+
+# Kapacita tréningov - max. počet prihlásených na čas tréningu
+# (čas, ktorý tu nie je, nemá limit; dá sa prepísať v secrets ako [slot_capacity])
+SLOT_CAPACITY = {}
+
+# Nároky podľa typu členstva - počet vstupov (None = neobmedzene) a platnosť v dňoch
+# (None = bez obmedzenia). "block" zamietne prihlásenie po vyčerpaní namiesto
+# označenia pre trénera, "first_visit_only" povolí typ len úplne novému členovi.
+MEMBERSHIP_ENTITLEMENTS = {
+    "Skúšobný tréning": {"entries": 1, "days": None, "block": True, "first_visit_only": True},
+    "Mesačné členstvo": {"entries": None, "days": 30},
+    "Jednorázový vstup": {"entries": 1, "days": None},
+    "Ročné členstvo": {"entries": None, "days": 365}
+}
+
+# Hárok so zoznamom členov (ID, Meno, Typ členstva, Čas tréningu) pre členské kódy
+ROSTER_SHEET_TITLE = "Členovia"
+
+# Ako dlho sa drží načítaný zoznam členov (sekundy)
+ROSTER_TTL = 600
+
+# Dĺžka podpisu v členskom kóde (znaky base62)
+MEMBER_TOKEN_TAG_LENGTH = 5
+
+# Základ URL aplikácie
+APP_URL = "https://giantgym.streamlit.app"
+
+# Statické súbory pre Wallet Pass (načítajú sa raz za proces)
+WALLET_ASSETS_DIR = "wallet_pass"
+WALLET_ASSET_FILES = ["icon.png", "icon@2x.png", "logo.png", "logo@2x.png", "strip.png", "strip@2x.png"]
+
+# Limity pokusov o prihlásenie: (max. počet, okno v sekundách) podľa klienta a podľa mena
+# (dá sa prepísať v secrets ako [rate_limits], napr. client = [10, 60])
+RATE_LIMITS = {
+    "client": (10, 60),
+    "name": (3, 600)
+}
+
+# Počet mesiacov na jednej strane štatistík
+STATS_MONTHS_PER_PAGE = 3
+
+# Limity pamäťových úložísk vygenerovaných súborov: (max. bajtov, TTL v sekundách)
+BLOB_STORE_LIMITS = {
+    "passes": (32 * 1024 * 1024, 30 * 60),
+    "qr": (16 * 1024 * 1024, 30 * 60)
+}
+
+# Hárok so zrkadlom evidencie členstiev
+LEDGER_SHEET_TITLE = "Členstvá"
+
+# Oneskorenie zápisu zmien evidencie do hárku (sekundy) - zmeny sa zlúčia
+LEDGER_MIRROR_DELAY = 30
+
+# Predvolená pobočka (URL parameter location) - hlavný spreadsheet zo secrets
+DEFAULT_LOCATION = "giantgym"
+
+# Počet súbežných čítaní pri načítaní histórie z viacerých spreadsheetov
+SHARD_READ_WORKERS = 4
+
+# Maximálny vek zdieľaného snímku dnešnej účasti (sekundy)
+SNAPSHOT_TTL = 15
+
+# Interval obnovy obrazovky pri vchode (view=display, sekundy)
+DISPLAY_REFRESH_SECONDS = 15
+
+# Koľko posledných profilov (?profile=1) sa uchováva
+PROFILE_RETENTION = 20
+
+# Kedy sa vopred vytvorí hárok na nasledujúci deň (HH:MM)
+SHEET_PROVISION_TIME = "23:50"
+
+# Ako dlho platí index denných hárkov, kým sa znova načíta zoznam (sekundy)
+SHEET_INDEX_TTL = 600
+
+# Adresár pre lokálne uložené dáta (agregáty, cache)
+DATA_DIR = "data"
+
+# Adresár pre uložené profily (?profile=1)
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+
+# Predpočítané mesačné reporty (monthly_report.py z cronu)
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+
+# Zdieľaný stav replík (front zápisov, duplicity, počítadlá, snímky)
+SHARED_STORE_PATH = os.path.join(DATA_DIR, "shared.sqlite3")
+
+# Zápis do Sheets robí len jedna replika - drží zámok s touto platnosťou (sekundy)
+WRITER_LEASE = "sheets-writer"
+WRITER_LEASE_TTL = 15
+
+# Hárky uzavretých dní číta naraz len jedna replika (platnosť zámku v sekundách
+# pokrýva aj prvé načítanie celej histórie)
+CLOSED_DAYS_LEASE = "closed-days"
+CLOSED_DAYS_LEASE_TTL = 600
+
+# Front prihlásení - interval a veľkosť dávky zápisu do Sheets
+CHECKIN_FLUSH_INTERVAL = 1.0
+CHECKIN_BATCH_SIZE = 100
+
+# Po koľkých neúspešných pokusoch (odstup max. 60 s) sa prihlásenie presunie
+# medzi nezapísané, ktoré vidí tréner
+CHECKIN_MAX_ATTEMPTS = 30
+
+# Ako dlho sa pamätá prihlásenie (deň, meno, čas) proti duplicitám (sekundy)
+CHECKIN_DEDUPE_TTL = 24 * 3600
+
+# Zahrievanie cache - pred polnocou sa pripraví zajtrajší hárok, po polnoci
+# sa doplnia agregáty uzavretého dňa (HH:MM)
+WARMUP_BEFORE_ROLLOVER = "23:55"
+WARMUP_AFTER_ROLLOVER = "00:01"
+
+# Retencia - koľko mesiacov po prvom tréningu sledujeme a po koľkých dňoch
+# neprítomnosti je člen ohrozený odchodom
+RETENTION_MONTHS = 3
+CHURN_DAYS = 21
+
+# Ohrození odchodom sa hľadajú len medzi členmi s tréningom za posledných
+# N dní - kto chýba dlhšie, už odišiel a zoznam by len rástol
+CHURN_WINDOW_DAYS = 90
+
+# Odhad účasti - trend sa počíta z posledných N uzavretých dní
+FORECAST_TREND_DAYS = 28
+FORECAST_TREND_LIMITS = (0.5, 1.5)
+
+# Názvy dní v týždni (index podľa datetime.weekday())
+WEEKDAY_NAMES = ['Pondelok', 'Utorok', 'Streda', 'Štvrtok', 'Piatok', 'Sobota', 'Nedeľa']
+
+logger = logging.getLogger("giantgym")
+
+
+@st.cache_resource(show_spinner=False)
+def _authorized_client():
+    """Autorizovaný klient pre celý proces (chyba sa necacheuje, ďalší pokus to skúsi znova)."""
+    # Načítanie credentials zo Streamlit secrets
+    credentials_dict = st.secrets["gcp_service_account"]
+    
+    scopes = [
+        "https://www.googleapis.com/auth/spreadsheets",
+        "https://www.googleapis.com/auth/drive"
+    ]
+    
+    credentials = Credentials.from_service_account_info(
+        credentials_dict,
+        scopes=scopes
+    )
+    
+    return gspread.authorize(credentials)
+
 
 def get_google_sheets_client():
     """Pripojenie k Google Sheets pomocou service account."""
     try:
-        # Načítanie credentials zo Streamlit secrets
-        credentials_dict = st.secrets["gcp_service_account"]
-        
-        scopes = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
-        credentials = Credentials.from_service_account_info(
-            credentials_dict,
-            scopes=scopes
-        )
-        
-        client = gspread.authorize(credentials)
-        return client
+        return _authorized_client()
     except Exception as e:
         st.error(f"Chyba pri pripojení k Google Sheets: {e}")
         return None
 
 
-def get_or_create_sheet(client, spreadsheet_id):
-    """Získanie alebo vytvorenie hárku pre dnešný deň."""
+def install_backend_call_counter():
+    """
+    Počítanie HTTP volaní na Google API pre profilovanie.
+    
+    Počítadlo je per vlákno a drží sa na obalenej metóde, aby prežilo
+    opätovné spustenie skriptu pri každom rerune.
+    """
     try:
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        today_str = date.today().strftime("%Y-%m-%d")
-        
-        # Skúsime nájsť hárok pre dnešný deň
-        try:
-            worksheet = spreadsheet.worksheet(today_str)
-        except gspread.WorksheetNotFound:
-            # Vytvoríme nový hárok
-            worksheet = spreadsheet.add_worksheet(
-                title=today_str,
-                rows=1000,
-                cols=5
-            )
-            # Pridáme hlavičku
-            worksheet.update('A1:E1', [['Čas', 'Meno', 'Typ členstva', 'Čas tréningu', 'Poznámka']])
-            worksheet.format('A1:E1', {
-                'textFormat': {'bold': True},
-                'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
-            })
-        
-        return worksheet
-    except Exception as e:
-        st.error(f"Chyba pri prístupe k spreadsheet: {e}")
-        return None
+        from gspread.http_client import HTTPClient as target
+    except ImportError:
+        target = gspread.Client
+    if hasattr(target.request, "calls"):
+        return target.request.calls
+    
+    original = target.request
+    calls = threading.local()
+    
+    def counted_request(self, *args, **kwargs):
+        calls.count = getattr(calls, "count", 0) + 1
+        return original(self, *args, **kwargs)
+    
+    counted_request.calls = calls
+    target.request = counted_request
+    return calls
+
+
+def backend_call_count():
+    """Počet volaní Google API z aktuálneho vlákna od štartu procesu."""
+    return getattr(install_backend_call_counter(), "count", 0)
+
+
+def get_spreadsheet_id():
+    """ID hlavného spreadsheetu - na top level secrets alebo vnútri gcp_service_account."""
+    if "spreadsheet_id" in st.secrets:
+        return st.secrets["spreadsheet_id"]
+    if "gcp_service_account" in st.secrets and "spreadsheet_id" in st.secrets["gcp_service_account"]:
+        return st.secrets["gcp_service_account"]["spreadsheet_id"]
+    return None
+
+
+class ShardRouter:
+    """
+    Smerovanie (pobočka, rok) → spreadsheet.
+    
+    Konfigurácia je v secrets ako [shards.<pobočka>] s kľúčmi podľa roku
+    (prípadne "default"). Čo nie je nakonfigurované, ide do hlavného
+    spreadsheetu, takže bez [shards] sa správanie nemení.
+    """
+
+    def __init__(self, primary_id, shards=None):
+        self.primary_id = primary_id
+        self.shards = {
+            location: {str(year): str(sheet_id) for year, sheet_id in by_year.items()}
+            for location, by_year in (shards or {}).items()
+        }
+
+    def locations(self):
+        return [DEFAULT_LOCATION] + [location for location in self.shards if location != DEFAULT_LOCATION]
+
+    def spreadsheet_for(self, location, year):
+        """Spreadsheet pre zápis - pobočka a rok dňa."""
+        by_year = self.shards.get(location, {})
+        return by_year.get(str(year)) or by_year.get("default") or self.primary_id
+
+    def shards_for(self, start=None, end=None):
+        """Zoznam (pobočka, spreadsheet_id) pokrývajúci obdobie - každý spreadsheet raz."""
+        result, seen = [], set()
+        for location in self.locations():
+            by_year = self.shards.get(location, {})
+            if start and end:
+                sheet_ids = [self.spreadsheet_for(location, year) for year in range(start.year, end.year + 1)]
+            else:
+                sheet_ids = [by_year[year] for year in sorted(by_year)]
+                sheet_ids.append(self.spreadsheet_for(location, None))
+            for sheet_id in sheet_ids:
+                if sheet_id not in seen:
+                    seen.add(sheet_id)
+                    result.append((location, sheet_id))
+        return result
+
+
+@st.cache_resource
+def get_shard_router(spreadsheet_id):
+    """Router pre hlavný spreadsheet s konfiguráciou [shards] zo secrets."""
+    try:
+        shards = {location: dict(by_year) for location, by_year in st.secrets.get("shards", {}).items()}
+    except Exception:
+        shards = {}
+    return ShardRouter(spreadsheet_id, shards)
+
+
+def ordered_parallel_map(func, items, workers=SHARD_READ_WORKERS):
+    """
+    Paralelný map s obmedzeným počtom rozpracovaných položiek.
+    
+    Výsledky sa vracajú v poradí vstupu a v pamäti je naraz najviac
+    `workers` výsledkov - vhodné aj na priebežný export.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(func, item) for item in itertools.islice(items, workers))
+        while pending:
+            result = pending.popleft().result()
+            for item in itertools.islice(items, 1):
+                pending.append(executor.submit(func, item))
+            yield result
+
 
+def day_sheet_title(day):
+    """Názov denného hárku vo formáte YYYY-MM-DD."""
+    return day.strftime("%Y-%m-%d")
 
-def add_attendance(worksheet, name, membership_type, training_time=""):
-    """Pridanie záznamu o účasti."""
+
+def is_day_sheet_title(title):
+    """Kontrola, či názov hárku je dátum vo formáte YYYY-MM-DD."""
     try:
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        row = [timestamp, name, membership_type, training_time, ""]
-        worksheet.append_row(row)
+        datetime.strptime(title, "%Y-%m-%d")
         return True
-    except Exception as e:
-        st.error(f"Chyba pri ukladaní: {e}")
+    except ValueError:
         return False
 
 
-def get_today_attendance(worksheet):
-    """Získanie dnešnej účasti."""
+def create_day_sheet(spreadsheet, day):
+    """
+    Atomické vytvorenie denného hárku.
+    
+    Hárok, hlavička, formátovanie aj verzia schémy sa zapíšu jedným
+    batch_update, takže hárok nikdy neexistuje bez hlavičky. sheetId je odvodené z dátumu, preto
+    dva súbežné pokusy vytvárajú ten istý hárok a druhý skončí chybou
+    "already exists" - tú berieme ako úspech a vrátime existujúci hárok.
+    """
+    title = day_sheet_title(day)
+    sheet_id = int(day.strftime("%Y%m%d"))
+    header_cells = [
+        {
+            'userEnteredValue': {'stringValue': column},
+            'userEnteredFormat': {
+                'textFormat': {'bold': True},
+                'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
+            }
+        }
+        for column in SHEET_HEADER
+    ]
+    body = {
+        'requests': [
+            {
+                'addSheet': {
+                    'properties': {
+                        'sheetId': sheet_id,
+                        'title': title,
+                        'gridProperties': {'rowCount': 1000, 'columnCount': len(SHEET_HEADER)}
+                    }
+                }
+            },
+            {
+                'updateCells': {
+                    'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                    'rows': [{'values': header_cells}],
+                    'fields': 'userEnteredValue,userEnteredFormat(textFormat,backgroundColor)'
+                }
+            },
+            {
+                'createDeveloperMetadata': {
+                    'developerMetadata': {
+                        'metadataKey': SCHEMA_METADATA_KEY,
+                        'metadataValue': str(SCHEMA_VERSION),
+                        'location': {'sheetId': sheet_id},
+                        'visibility': 'DOCUMENT'
+                    }
+                }
+            }
+        ]
+    }
+    try:
+        spreadsheet.batch_update(body)
+    except gspread.exceptions.APIError as e:
+        if "already exists" not in str(e):
+            raise
+    return spreadsheet.worksheet(title)
+
+
+def get_or_create_sheet(client, spreadsheet_id):
+    """Získanie alebo vytvorenie hárku pre dnešný deň."""
     try:
-        records = worksheet.get_all_records()
-        return pd.DataFrame(records)
+        return get_sheet_catalog().day_sheet(client, spreadsheet_id, date.today())
     except Exception as e:
-        st.error(f"Chyba pri načítaní dát: {e}")
-        return pd.DataFrame()
+        st.error(f"Chyba pri prístupe k spreadsheet: {e}")
+        return None
+
+
+def seconds_until(clock, now=None):
+    """Počet sekúnd do najbližšieho času HH:MM."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in clock.split(":"))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+
+def seconds_until_provisioning(now=None):
+    """Počet sekúnd do najbližšieho spustenia plánovača (SHEET_PROVISION_TIME)."""
+    return seconds_until(SHEET_PROVISION_TIME, now)
+
+
+def provision_day_sheets(client, catalog, spreadsheet_id, days):
+    """Vytvorí chýbajúce denné hárky pre zadané dni."""
+    spreadsheet = client.open_by_key(spreadsheet_id)
+    index = catalog.index(client, spreadsheet_id)
+    index.refresh(client, spreadsheet_id)
+    for day in days:
+        if not index.between(day, day):
+            index.add(create_day_sheet(spreadsheet, day))
+            logger.info("Vytvorený denný hárok %s", day_sheet_title(day))
+
+
+def _sheet_scheduler_loop(client, router, store, catalog):
+    """Slučka plánovača - každý deň o SHEET_PROVISION_TIME pripraví hárok na zajtra pre každú pobočku."""
+    # Prvý beh hneď pri štarte procesu doplní aj prípadne chýbajúci dnešný hárok
+    while True:
+        today = date.today()
+        # Hárky vytvára len replika, ktorá je zapisovateľom
+        locations = router.locations() if is_sheets_writer(store) else []
+        for location in locations:
+            # Na prelome roka môže zajtrajšok patriť do iného spreadsheetu
+            for day in [today, today + timedelta(days=1)]:
+                try:
+                    provision_day_sheets(client, catalog, router.spreadsheet_for(location, day.year), [day])
+                except Exception:
+                    logger.exception("Predvytvorenie denného hárku zlyhalo (%s, %s)", location, day)
+        time_module.sleep(seconds_until_provisioning())
+
+
+@st.cache_resource
+def start_sheet_scheduler(_client, spreadsheet_id):
+    """Spustí plánovač denných hárkov - raz za proces (singletony sa získajú tu, v skripte)."""
+    thread = threading.Thread(
+        target=_sheet_scheduler_loop,
+        args=(_client, get_shard_router(spreadsheet_id), get_shared_store(), get_sheet_catalog()),
+        name="day-sheet-scheduler",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def checkin_row_key(row):
+    """
+    Identita riadku účasti [Čas, Meno, Typ členstva, Čas tréningu, ...].
+    
+    Čas sa porovnáva na minúty ako v delete_attendance, takže riadok z
+    frontu spozná aj po prečítaní z hárku.
+    """
+    timestamp, name, membership_type, training_time = (str(value) for value in row[:4])
+    return (name, membership_type, training_time, timestamp[:5])
+
+
+def sheet_frame(records, title=""):
+    """
+    DataFrame z riadkov denného hárku so stĺpcami SHEET_HEADER.
+    
+    Stĺpce nemigrovaných hárkov sa premenujú podľa LEGACY_COLUMNS a chýbajúca
+    Poznámka sa doplní prázdna. Ak chýba iný stĺpec, vyhodí ValueError -
+    hárok sa potom nepovažuje za načítaný.
+    """
+    df = pd.DataFrame(records)
+    if df.empty:
+        return pd.DataFrame(columns=SHEET_HEADER)
+    df = df.rename(columns=LEGACY_COLUMNS)
+    if 'Poznámka' not in df.columns:
+        df['Poznámka'] = ""
+    missing = [column for column in SHEET_HEADER if column not in df.columns]
+    if missing:
+        raise ValueError(f"hárku {title} chýbajú stĺpce {', '.join(missing)}")
+    return df
+
+
+def with_pending_rows(df, pending):
+    """
+    DataFrame dňa doplnený o riadky, ktoré ešte nie sú v hárku
+    (SharedStore.pending_rows), so stĺpcom Zápis.
+    
+    Riadok, ktorý snímok hárku už obsahuje (zapisovateľ ho zapísal, ale
+    ešte neoznačil), sa nepridá druhýkrát.
+    """
+    df = df.assign(Zápis="")
+    in_sheet = {}
+    for row in df[SHEET_HEADER[:4]].itertuples(index=False):
+        key = checkin_row_key(row)
+        in_sheet[key] = in_sheet.get(key, 0) + 1
+    records = []
+    for row, dead in pending:
+        key = checkin_row_key(row)
+        if in_sheet.get(key):
+            in_sheet[key] -= 1
+            continue
+        records.append(dict(zip(SHEET_HEADER, row), Zápis="⚠️ nezapísané" if dead else "⏳ čaká na zápis"))
+    if not records:
+        return df
+    return pd.concat([df, pd.DataFrame(records, columns=df.columns)], ignore_index=True)
 
 
 def delete_attendance(worksheet, name, timestamp, membership_type, training_time=""):
@@ -177,79 +568,2333 @@ def delete_attendance(worksheet, name, timestamp, membership_type, training_time
         return False
 
 
-def get_all_worksheets(client, spreadsheet_id):
-    """Získanie všetkých hárkov zo spreadsheetu."""
+def get_slot_capacity(training_time):
+    """Kapacita pre čas tréningu - None znamená bez limitu."""
+    capacity = SLOT_CAPACITY.get(training_time)
     try:
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        worksheets = spreadsheet.worksheets()
-        return worksheets
-    except Exception as e:
-        st.error(f"Chyba pri načítaní hárkov: {e}")
-        return []
+        capacity = st.secrets.get("slot_capacity", {}).get(training_time, capacity)
+    except Exception:
+        pass
+    return int(capacity) if capacity else None
 
 
-def get_all_attendance_data(client, spreadsheet_id):
-    """Získanie všetkých dát o účasti zo všetkých hárkov."""
-    try:
-        worksheets = get_all_worksheets(client, spreadsheet_id)
-        all_data = []
+class SharedStore:
+    """
+    Zdieľaný stav pre viac replík aplikácie na jednom stroji (SQLite v DATA_DIR).
+    
+    Front zápisov, index duplicít, počítadlá, snímky dnešnej účasti,
+    tréningy s rebríčkami a evidencia členstiev sú v jednom súbore, takže
+    ich vidia všetky procesy. Do Sheets zapisuje len replika, ktorá drží
+    zámok zapisovateľa - zámok má platnosť a obnovuje sa, takže keď
+    replika skončí, po WRITER_LEASE_TTL ho prevezme iná.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL,
+            generation INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS dedupe (
+            key TEXT PRIMARY KEY, expires_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS checkin_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            spreadsheet_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            row TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0,
+            error TEXT,
+            claimed_until REAL NOT NULL DEFAULT 0,
+            written_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS dead_letters (
+            id INTEGER PRIMARY KEY,
+            spreadsheet_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            row TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            error TEXT,
+            failed_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS slot_counts (
+            day TEXT NOT NULL, slot TEXT NOT NULL, membership TEXT NOT NULL, count INTEGER NOT NULL,
+            PRIMARY KEY (day, slot, membership)
+        );
+        CREATE TABLE IF NOT EXISTS seeded_days (
+            day TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS snapshots (
+            key TEXT PRIMARY KEY, stored_at REAL NOT NULL, payload TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS visits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            day TEXT NOT NULL, member TEXT NOT NULL, name TEXT NOT NULL,
+            slot TEXT NOT NULL, membership TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS visits_by_day ON visits (day);
+        CREATE INDEX IF NOT EXISTS visits_by_member ON visits (member, day);
+        CREATE TABLE IF NOT EXISTS closed_days (
+            day TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS rankings (
+            scope TEXT NOT NULL, member TEXT NOT NULL, name TEXT NOT NULL, count INTEGER NOT NULL,
+            PRIMARY KEY (scope, member)
+        );
+        CREATE INDEX IF NOT EXISTS rankings_by_count ON rankings (scope, count);
+        CREATE TABLE IF NOT EXISTS entitlements (
+            member TEXT PRIMARY KEY, name TEXT NOT NULL, membership TEXT NOT NULL,
+            valid_until TEXT, remaining INTEGER, updated TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entitlement_charges (
+            charge TEXT PRIMARY KEY, member TEXT NOT NULL, membership TEXT NOT NULL, created REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS state (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL
+        );
+    """
+
+    # Stĺpce pridané do existujúcich tabuliek - staršie súbory sa pri štarte doplnia
+    ADDED_COLUMNS = [
+        ("leases", "generation", "INTEGER NOT NULL DEFAULT 0"),
+        ("checkin_queue", "claimed_until", "REAL NOT NULL DEFAULT 0"),
+        ("checkin_queue", "written_at", "REAL")
+    ]
+
+    def __init__(self, path=None):
+        self.path = path or SHARED_STORE_PATH
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = self._connection()
+        db.executescript(self.SCHEMA)
+        for table, column, definition in self.ADDED_COLUMNS:
+            if column not in [info[1] for info in db.execute(f"PRAGMA table_info({table})")]:
+                try:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                except sqlite3.OperationalError:
+                    pass  # súbežne ho pridala iná replika
+
+    def _connection(self):
+        """Spojenie pre aktuálne vlákno (sqlite3 spojenia sa nezdieľajú medzi vláknami)."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Zápisová transakcia - zámok databázy sa berie hneď (BEGIN IMMEDIATE)."""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    # Voľba zapisovateľa
+
+    def acquire_lease(self, name, ttl):
+        """
+        Získanie alebo predĺženie zámku - vráti jeho generáciu, alebo None,
+        ak ho drží iná živá replika.
         
-        for worksheet in worksheets:
-            try:
-                # Skúsime načítať dáta z hárku
-                records = worksheet.get_all_records()
-                if records:
-                    df = pd.DataFrame(records)
-                    # Pridáme dátum z názvu hárku
-                    sheet_name = worksheet.title
-                    df['Dátum'] = sheet_name
-                    all_data.append(df)
-            except Exception as e:
-                # Preskočíme hárky, ktoré nemajú správny formát
-                continue
+        Generácia sa zvýši pri každom novom získaní (aj po vypršaní vlastného
+        zámku), takže zápis s generáciou zistenou pred prevzatím inou
+        replikou už neprejde kontrolou (holds_lease, claim_batch).
+        """
+        now = time_module.time()
+        with self.transaction() as db:
+            row = db.execute("SELECT owner, expires_at, generation FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                return None
+            generation = row[2] if row and row[1] > now else (row[2] if row else 0) + 1
+            db.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at, generation) VALUES (?, ?, ?, ?)",
+                (name, self.owner, now + ttl, generation)
+            )
+            return generation
+
+    def holds_lease(self, name, generation):
+        """Či tento proces stále drží zámok v danej generácii."""
+        return bool(self.query(
+            "SELECT 1 FROM leases WHERE name = ? AND owner = ? AND generation = ? AND expires_at > ?",
+            (name, self.owner, generation, time_module.time())
+        ))
+
+    def release_lease(self, name):
+        with self.transaction() as db:
+            db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def lease_holder(self, name):
+        rows = self.query(
+            "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time_module.time())
+        )
+        return rows[0][0] if rows else None
+
+    # Index duplicít
+
+    def claim(self, key, ttl):
+        """Zaregistrovanie kľúča - False, ak už platí (duplicita)."""
+        now = time_module.time()
+        with self.transaction() as db:
+            db.execute("DELETE FROM dedupe WHERE expires_at <= ?", (now,))
+            cursor = db.execute("INSERT OR IGNORE INTO dedupe VALUES (?, ?)", (key, now + ttl))
+            return cursor.rowcount == 1
+
+    def release(self, key):
+        with self.transaction() as db:
+            db.execute("DELETE FROM dedupe WHERE key = ?", (key,))
+
+    # Front zápisov
+
+    #
+    # Zapísané riadky sa vo fronte nechávajú (written_at) do konca
+    # nasledujúceho dňa - SlotCounters.seed podľa nich spozná riadky hárku,
+    # ktoré prišli cez front, a nezaráta ich dvakrát.
+
+    @staticmethod
+    def insert_checkin(db, spreadsheet_id, title, row):
+        """Zaradenie riadku do frontu v rámci otvorenej transakcie."""
+        db.execute(
+            "INSERT INTO checkin_queue (spreadsheet_id, title, row) VALUES (?, ?, ?)",
+            (spreadsheet_id, title, json.dumps(row, ensure_ascii=False))
+        )
+
+    @staticmethod
+    def day_checkins(db, spreadsheet_id, title):
+        """Všetky riadky dňa prijaté cez front - čakajúce, zapísané aj nezapísané."""
+        rows = db.execute(
+            "SELECT row FROM checkin_queue WHERE spreadsheet_id = ? AND title = ? "
+            "UNION ALL SELECT row FROM dead_letters WHERE spreadsheet_id = ? AND title = ?",
+            (spreadsheet_id, title, spreadsheet_id, title)
+        ).fetchall()
+        return [json.loads(row) for (row,) in rows]
+
+    @staticmethod
+    def take_checkin(db, spreadsheet_id, title, row, written):
+        """
+        Vymazanie riadku z frontu v rámci otvorenej transakcie - True, ak sa našiel.
         
-        if all_data:
-            return pd.concat(all_data, ignore_index=True)
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"Chyba pri načítaní všetkých dát: {e}")
-        return pd.DataFrame()
+        written=True hľadá už zapísaný riadok, written=False čakajúci, ktorý
+        práve nezapisuje zapisovateľ (ten sa potom do hárku už nedostane).
+        Riadky sa porovnávajú podľa checkin_row_key.
+        """
+        if written:
+            candidates = db.execute(
+                "SELECT id, row FROM checkin_queue WHERE spreadsheet_id = ? AND title = ? AND written_at IS NOT NULL",
+                (spreadsheet_id, title)
+            ).fetchall()
+        else:
+            candidates = db.execute(
+                "SELECT id, row FROM checkin_queue WHERE spreadsheet_id = ? AND title = ? "
+                "AND written_at IS NULL AND claimed_until <= ?",
+                (spreadsheet_id, title, time_module.time())
+            ).fetchall()
+        key = checkin_row_key(row)
+        for item_id, stored in candidates:
+            if checkin_row_key(json.loads(stored)) == key:
+                db.execute("DELETE FROM checkin_queue WHERE id = ?", (item_id,))
+                return True
+        return False
+
+    def claim_batch(self, lease, generation, limit, claim_ttl):
+        """
+        Najstaršie položky pripravené na zápis - [(id, spreadsheet_id, title, row)].
+        
+        V tej istej transakcii sa overí zámok (generácia) a položky sa na
+        claim_ttl označia ako rozpracované, takže ich iný zapisovateľ nevezme.
+        """
+        now = time_module.time()
+        with self.transaction() as db:
+            if not db.execute(
+                "SELECT 1 FROM leases WHERE name = ? AND owner = ? AND generation = ? AND expires_at > ?",
+                (lease, self.owner, generation, now)
+            ).fetchone():
+                return []
+            rows = db.execute(
+                "SELECT id, spreadsheet_id, title, row FROM checkin_queue "
+                "WHERE written_at IS NULL AND next_attempt <= ? AND claimed_until <= ? ORDER BY id LIMIT ?",
+                (now, now, limit)
+            ).fetchall()
+            db.executemany(
+                "UPDATE checkin_queue SET claimed_until = ? WHERE id = ?", [(now + claim_ttl, row[0]) for row in rows]
+            )
+        return [(item_id, spreadsheet_id, title, json.loads(row)) for item_id, spreadsheet_id, title, row in rows]
+
+    def unclaim(self, ids):
+        """Vrátenie rozpracovaných položiek (zapisovateľ prišiel o zámok)."""
+        with self.transaction() as db:
+            db.executemany("UPDATE checkin_queue SET claimed_until = 0 WHERE id = ?", [(item_id,) for item_id in ids])
+
+    def pending_rows(self, spreadsheet_id, title):
+        """
+        Riadky denného hárku, ktoré ešte nie sú v Sheets - [(row, nezapísaný)].
+        
+        nezapísaný je True pre riadky medzi nezapísanými (rieši ich tréner),
+        False pre riadky, ktoré ešte čakajú vo fronte.
+        """
+        rows = self.query(
+            "SELECT row, 0 FROM checkin_queue WHERE spreadsheet_id = ? AND title = ? AND written_at IS NULL "
+            "UNION ALL SELECT row, 1 FROM dead_letters WHERE spreadsheet_id = ? AND title = ?",
+            (spreadsheet_id, title, spreadsheet_id, title)
+        )
+        return [(json.loads(row), bool(dead)) for row, dead in rows]
+
+    def complete(self, ids):
+        """Označenie položiek ako zapísaných - zapísané z dní pred včerajškom sa zahodia."""
+        cutoff = day_sheet_title(date.today() - timedelta(days=1))
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE checkin_queue SET written_at = ?, claimed_until = 0 WHERE id = ?",
+                [(time_module.time(), item_id) for item_id in ids]
+            )
+            db.execute("DELETE FROM checkin_queue WHERE written_at IS NOT NULL AND title < ?", (cutoff,))
+
+    @staticmethod
+    def _bury(db, ids, min_attempts=0):
+        """Presun položiek s aspoň min_attempts pokusmi z frontu medzi nezapísané."""
+        now = time_module.time()
+        for item_id in ids:
+            moved = db.execute(
+                "INSERT INTO dead_letters SELECT id, spreadsheet_id, title, row, attempts, error, ? "
+                "FROM checkin_queue WHERE id = ? AND attempts >= ?",
+                (now, item_id, min_attempts)
+            ).rowcount
+            if moved:
+                db.execute("DELETE FROM checkin_queue WHERE id = ?", (item_id,))
+
+    def retry(self, ids, error, max_attempts=CHECKIN_MAX_ATTEMPTS):
+        """Neúspešný zápis - ďalší pokus s rastúcim odstupom (max. 60 s), po max_attempts medzi nezapísané."""
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE checkin_queue SET attempts = attempts + 1, error = ?, claimed_until = 0, "
+                "next_attempt = ? + MIN(60, 1 << MIN(attempts, 6)) WHERE id = ?",
+                [(error, time_module.time(), item_id) for item_id in ids]
+            )
+            self._bury(db, ids, max_attempts)
+
+    def bury(self, ids, error):
+        """Zápis, ktorý opakovanie neopraví (napr. zmazaný hárok) - hneď medzi nezapísané."""
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE checkin_queue SET attempts = attempts + 1, error = ? WHERE id = ?",
+                [(error, item_id) for item_id in ids]
+            )
+            self._bury(db, ids)
+
+    def dead_letters(self):
+        """Nezapísané prihlásenia pre trénera - [(id, spreadsheet_id, title, row, pokusy, chyba)]."""
+        rows = self.query(
+            "SELECT id, spreadsheet_id, title, row, attempts, error FROM dead_letters ORDER BY id"
+        )
+        return [(item_id, spreadsheet_id, title, json.loads(row), attempts, error)
+                for item_id, spreadsheet_id, title, row, attempts, error in rows]
+
+    def requeue(self, item_id):
+        """Nezapísané prihlásenie späť do frontu (napr. po obnovení hárku)."""
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO checkin_queue (spreadsheet_id, title, row) "
+                "SELECT spreadsheet_id, title, row FROM dead_letters WHERE id = ?",
+                (item_id,)
+            )
+            db.execute("DELETE FROM dead_letters WHERE id = ?", (item_id,))
+
+    @staticmethod
+    def take_dead_letter(db, item_id):
+        """Vymazanie nezapísaného prihlásenia v rámci otvorenej transakcie - vráti jeho riadok, alebo None."""
+        rows = db.execute("SELECT row FROM dead_letters WHERE id = ?", (item_id,)).fetchall()
+        if not rows:
+            return None
+        db.execute("DELETE FROM dead_letters WHERE id = ?", (item_id,))
+        return json.loads(rows[0][0])
+
+    def queue_stats(self):
+        depth, max_attempts = self.query(
+            "SELECT COUNT(*), COALESCE(MAX(attempts), 0) FROM checkin_queue WHERE written_at IS NULL"
+        )[0]
+        dead = self.query("SELECT COUNT(*) FROM dead_letters")[0][0]
+        errors = self.query(
+            "SELECT error FROM checkin_queue WHERE written_at IS NULL AND error IS NOT NULL ORDER BY id DESC LIMIT 1"
+        )
+        return {
+            "depth": depth, "max_attempts": max_attempts, "dead": dead,
+            "last_error": errors[0][0] if errors else None
+        }
+
+    # Snímky dnešnej účasti
+
+    def put_snapshot(self, key, records):
+        with self.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                (key, time_module.time(), json.dumps(records, ensure_ascii=False))
+            )
+            # Staršie dni už nepotrebujeme (zahriatie zajtrajška nesmie zmazať dnešok)
+            db.execute("DELETE FROM snapshots WHERE substr(key, 1, 10) < ?", (day_sheet_title(date.today()),))
+
+    def get_snapshot(self, key, max_age):
+        """Záznamy snímku, ak nie je starší ako max_age sekúnd, inak None."""
+        rows = self.query(
+            "SELECT payload FROM snapshots WHERE key = ? AND stored_at > ?", (key, time_module.time() - max_age)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def drop_snapshot(self, key):
+        with self.transaction() as db:
+            db.execute("DELETE FROM snapshots WHERE key = ?", (key,))
+
+    # Značky a verzie (napr. posledný uzavretý deň)
+
+    def get_state(self, key, default=None):
+        rows = self.query("SELECT value FROM state WHERE key = ?", (key,))
+        return rows[0][0] if rows else default
+
+    @staticmethod
+    def bump_version(db, key):
+        """Zvýšenie počítadla verzie v rámci otvorenej transakcie."""
+        db.execute(
+            "INSERT INTO state VALUES (?, '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+            (key,)
+        )
+
+
+@st.cache_resource
+def get_shared_store():
+    """Spojenie na zdieľaný stav replík - jedno pre proces."""
+    return SharedStore()
+
+
+def is_sheets_writer(store):
+    """Či je tento proces zapisovateľom do Sheets (získa alebo predĺži zámok)."""
+    return store.acquire_lease(WRITER_LEASE, WRITER_LEASE_TTL) is not None
+
+
+class SlotCounters:
+    """
+    Počítadlá prihlásených zdieľané všetkými replikami (SharedStore).
+    
+    Počty sa držia podľa (deň, čas tréningu, typ členstva), kontrola
+    kapacity a pripočítanie sú jedna transakcia, takže ani súbežné repliky
+    neprekročia kapacitu. Každý deň sa raz naplní z denného hárku a frontu
+    zápisov, potom sa už len aktualizuje pri prihlásení a vymazaní - vždy
+    v tej istej transakcii ako zmena frontu, aby seed medzi nimi nevidel
+    riadok bez počtu alebo počet bez riadku.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def is_seeded(self, day):
+        return bool(self.store.query("SELECT 1 FROM seeded_days WHERE day = ?", (day,)))
+
+    def seeded_days(self):
+        return [seeded_day for (seeded_day,) in self.store.query("SELECT day FROM seeded_days")]
+
+    def seed(self, day, df):
+        """
+        Naplnenie počítadiel pre deň z DataFrame denného hárku a z frontu zápisov.
+        
+        Riadky prijaté cez front (čakajúce, zapísané aj nezapísané) sa čítajú
+        v tej istej transakcii, v ktorej sa zapíšu počty, a rátajú sa vždy.
+        Z hárku sa pripočítajú len riadky, ktoré vo fronte nie sú (zapísané
+        ručne) - riadok, ktorý zapisovateľ už zapísal, ale ešte neoznačil,
+        sa tak nezaráta dvakrát, ani keď je snímok hárku starší ako front.
+        """
+        sheet_rows = {}
+        if not df.empty and all(column in df.columns for column in SHEET_HEADER[:4]):
+            for row in df[SHEET_HEADER[:4]].itertuples(index=False):
+                key = checkin_row_key(row)
+                sheet_rows[key] = sheet_rows.get(key, 0) + 1
+        # Deň je "YYYY-MM-DD@spreadsheet"
+        title, _, spreadsheet_id = day.partition("@")
+        # Staršie dni už nepotrebujeme - predchádzajúci sa drží, lebo zajtrajšok
+        # sa seeduje ešte pred polnocou (zahrievanie)
+        cutoff = (datetime.strptime(day[:10], "%Y-%m-%d").date() - timedelta(days=1)).isoformat()
+        with self.store.transaction() as db:
+            counts = {}
+            for row in self.store.day_checkins(db, spreadsheet_id, title):
+                key = checkin_row_key(row)
+                if sheet_rows.get(key):
+                    sheet_rows[key] -= 1
+                counts[(row[3], row[2])] = counts.get((row[3], row[2]), 0) + 1
+            for (_, membership, slot, _), cnt in sheet_rows.items():
+                if cnt:
+                    counts[(slot, membership)] = counts.get((slot, membership), 0) + cnt
+            # Seedovaný deň sa nahradí celý (porovnáva sa len dátum)
+            db.execute("DELETE FROM slot_counts WHERE substr(day, 1, 10) < ? OR day = ?", (cutoff, day))
+            db.executemany(
+                "INSERT INTO slot_counts VALUES (?, ?, ?, ?)",
+                [(day, slot, membership, cnt) for (slot, membership), cnt in counts.items()]
+            )
+            db.execute("DELETE FROM seeded_days WHERE substr(day, 1, 10) < ?", (cutoff,))
+            db.execute("INSERT OR IGNORE INTO seeded_days VALUES (?)", (day,))
+
+    def try_add(self, day, slot, membership, capacity=None, row=None):
+        """
+        Pripočítanie prihlásenia - vráti False, ak je čas tréningu plný.
+        
+        S row sa riadok v tej istej transakcii zaradí do frontu zápisov.
+        """
+        with self.store.transaction() as db:
+            total = db.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM slot_counts WHERE day = ? AND slot = ?", (day, slot)
+            ).fetchone()[0]
+            if capacity is not None and total >= capacity:
+                return False
+            db.execute(
+                "INSERT INTO slot_counts VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (day, slot, membership) DO UPDATE SET count = count + 1",
+                (day, slot, membership)
+            )
+            if row is not None:
+                title, _, spreadsheet_id = day.partition("@")
+                self.store.insert_checkin(db, spreadsheet_id, title, row)
+            return True
+
+    @staticmethod
+    def _decrement(db, day, slot, membership):
+        db.execute(
+            "UPDATE slot_counts SET count = count - 1 WHERE day = ? AND slot = ? AND membership = ? AND count > 0",
+            (day, slot, membership)
+        )
+
+    def remove(self, day, slot, membership, row=None):
+        """
+        Odpočítanie prihlásenia (vymazanie z hárku).
+        
+        S row sa z frontu v tej istej transakcii zahodí aj jeho zapísaný riadok.
+        """
+        with self.store.transaction() as db:
+            if row is not None:
+                title, _, spreadsheet_id = day.partition("@")
+                self.store.take_checkin(db, spreadsheet_id, title, row, written=True)
+            self._decrement(db, day, slot, membership)
+
+    def withdraw(self, day, row):
+        """
+        Zrušenie prihlásenia, ktoré ešte čaká vo fronte - vráti True, ak sa
+        riadok našiel (do hárku sa už nezapíše) a počet sa odpočítal.
+        """
+        title, _, spreadsheet_id = day.partition("@")
+        with self.store.transaction() as db:
+            if not self.store.take_checkin(db, spreadsheet_id, title, row, written=False):
+                return False
+            self._decrement(db, day, row[3], row[2])
+            return True
+
+    def discard(self, day, item_id):
+        """Zahodenie nezapísaného prihlásenia aj jeho počtu - vráti jeho riadok, alebo None."""
+        with self.store.transaction() as db:
+            row = self.store.take_dead_letter(db, item_id)
+            if row is not None:
+                self._decrement(db, day, row[3], row[2])
+            return row
+
+    def slot_total(self, day, slot):
+        return self.store.query(
+            "SELECT COALESCE(SUM(count), 0) FROM slot_counts WHERE day = ? AND slot = ?", (day, slot)
+        )[0][0]
+
+    def day_total(self, day):
+        return self.store.query("SELECT COALESCE(SUM(count), 0) FROM slot_counts WHERE day = ?", (day,))[0][0]
+
+    def membership_totals(self, day):
+        """Počty podľa typu členstva, zoradené zostupne."""
+        rows = self.store.query(
+            "SELECT membership, SUM(count) AS total FROM slot_counts WHERE day = ? "
+            "GROUP BY membership HAVING total > 0 ORDER BY total DESC",
+            (day,)
+        )
+        return dict(rows)
+
+
+@st.cache_resource
+def get_slot_counters():
+    """Počítadlá nad zdieľaným stavom - jedna inštancia pre proces."""
+    return SlotCounters(get_shared_store())
+
+
+def _checkin_writer_loop(client, store, snapshot):
+    """
+    Slučka zapisovateľa - ak tento proces drží zámok, zapíše front do Sheets.
+    
+    Riadky sa zoskupia podľa denného hárku a zapíšu jedným append_rows.
+    Pred každým zápisom sa overí generácia zámku - zapisovateľ, ktorému
+    zámok medzičasom prevzala iná replika, už nezapíše nič. Po zápise sa
+    zahodí zdieľaný snímok dňa, aby ho čitatelia obnovili. Chyby, ktoré
+    opakovanie neopraví, a položky po CHECKIN_MAX_ATTEMPTS pokusoch sa
+    presunú medzi nezapísané (rieši ich tréner).
+    """
+    worksheets = {}
+    while True:
+        time_module.sleep(CHECKIN_FLUSH_INTERVAL)
+        try:
+            generation = store.acquire_lease(WRITER_LEASE, WRITER_LEASE_TTL)
+            if generation is None:
+                continue
+            groups = {}
+            for item_id, spreadsheet_id, title, row in store.claim_batch(
+                WRITER_LEASE, generation, CHECKIN_BATCH_SIZE, WRITER_LEASE_TTL
+            ):
+                groups.setdefault((spreadsheet_id, title), []).append((item_id, row))
+        except Exception:
+            logger.exception("Čítanie frontu prihlásení zlyhalo")
+            continue
+        
+        for (spreadsheet_id, title), items in groups.items():
+            ids = [item_id for item_id, _ in items]
+            try:
+                worksheet = worksheets.get((spreadsheet_id, title))
+                if worksheet is None:
+                    # Hárky predchádzajúcich dní už nepotrebujeme
+                    worksheets = {key: ws for key, ws in worksheets.items() if key[1] >= title}
+                    worksheet = client.open_by_key(spreadsheet_id).worksheet(title)
+                    worksheets[(spreadsheet_id, title)] = worksheet
+                if not store.holds_lease(WRITER_LEASE, generation):
+                    logger.warning("Zámok zapisovateľa prevzala iná replika - zápis sa preskočí")
+                    store.unclaim([item_id for group in groups.values() for item_id, _ in group])
+                    break
+                worksheet.append_rows([row for _, row in items])
+                store.complete(ids)
+                store.drop_snapshot(f"{title}@{spreadsheet_id}")
+                snapshot.invalidate_day(f"{title}@{spreadsheet_id}")
+            except Exception as e:
+                worksheets.pop((spreadsheet_id, title), None)
+                try:
+                    if is_retryable_write_error(e):
+                        store.retry(ids, str(e))
+                    else:
+                        store.bury(ids, str(e))
+                except Exception:
+                    logger.exception("Uloženie chyby zápisu do frontu zlyhalo")
+                logger.exception("Zápis %d prihlásení do hárku %s zlyhal", len(ids), title)
+
+
+def is_retryable_write_error(error):
+    """
+    Či má zmysel zápis zopakovať - sieť, kvóta (429) a chyby servera (5xx) áno,
+    chýbajúci hárok/spreadsheet a ostatné chyby požiadavky (4xx) nie.
+    """
+    if isinstance(error, (gspread.WorksheetNotFound, gspread.SpreadsheetNotFound)):
+        return False
+    if isinstance(error, gspread.exceptions.APIError):
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        return status is None or status == 429 or status >= 500
+    return True
+
+
+@st.cache_resource
+def start_checkin_writer(_client):
+    """Spustí zapisovateľa frontu prihlásení - raz za proces (zapisuje len zvolená replika)."""
+    thread = threading.Thread(
+        target=_checkin_writer_loop,
+        args=(_client, get_shared_store(), get_today_snapshot()),
+        name="checkin-writer",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def counter_day(worksheet):
+    """Kľúč dňa pre počítadlá - dátum a spreadsheet (pobočky majú oddelené počty)."""
+    return f"{worksheet.title}@{worksheet.spreadsheet.id}"
+
+
+class TodaySnapshot:
+    """
+    Zdieľaný snímok dnešnej účasti pre všetky obrazovky v procese.
+    
+    Hárok číta vždy len jeden čitateľ (najviac raz za SNAPSHOT_TTL alebo po
+    zmene), ostatní medzitým dostanú posledný stav. Prečítané záznamy sa
+    zverejnia v SharedStore, takže ostatné repliky hárok znova nečítajú.
+    Typ členstva a čas tréningu sú kategórie a počty podľa času sú predpočítané.
+    Neúspešné čítanie sa neuloží - vráti sa posledný stav, a ak žiadny nie je,
+    chyba sa vyhodí.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._refresh_lock = threading.Lock()
+        self._entries = {}
+
+    @staticmethod
+    def _compact(df):
+        if df.empty:
+            return df
+        for column in ['Typ členstva', 'Čas tréningu']:
+            if column in df.columns:
+                df[column] = df[column].astype('category')
+        return df
+
+    def _is_fresh(self, entry):
+        return entry is not None and time_module.monotonic() - entry['loaded_at'] < SNAPSHOT_TTL
+
+    def _entry(self, worksheet, force=False):
+        """Záznam snímku dňa - obnoví ho najviac jeden čitateľ naraz."""
+        day = counter_day(worksheet)
+        entry = self._entries.get(day)
+        if not force and self._is_fresh(entry):
+            return entry
+        
+        # Ak už snímok existuje, kým ho niekto obnovuje, vrátime posledný stav
+        if not self._refresh_lock.acquire(blocking=entry is None or force):
+            return entry
+        try:
+            entry = self._entries.get(day)
+            if not force and self._is_fresh(entry):
+                return entry
+            try:
+                records = None if force else self.store.get_snapshot(day, SNAPSHOT_TTL)
+                if records is None:
+                    records = sheet_frame(worksheet.get_all_records(), worksheet.title).to_dict('records')
+                    self.store.put_snapshot(day, records)
+            except Exception:
+                if entry is None:
+                    raise
+                logger.warning("Snímok %s sa nepodarilo obnoviť, zostáva posledný stav", day, exc_info=True)
+                return entry
+            df = self._compact(pd.DataFrame(records, columns=SHEET_HEADER))
+            entry = {
+                'df': df,
+                'slot_counts': df['Čas tréningu'].value_counts().to_dict(),
+                'loaded_at': time_module.monotonic()
+            }
+            # Staršie dni už nepotrebujeme (zahriatie zajtrajška nesmie zmazať dnešok)
+            today = day_sheet_title(date.today())
+            entries = {key: value for key, value in self._entries.items() if key[:10] >= today}
+            entries[day] = entry
+            self._entries = entries
+            return entry
+        finally:
+            self._refresh_lock.release()
+
+    def get(self, worksheet, force=False):
+        """Dnešné dáta (DataFrame) - pri chybe čítania bez posledného stavu vyhodí výnimku."""
+        return self._entry(worksheet, force)['df']
+
+    def slot_counts(self, worksheet):
+        """Počty podľa času tréningu zo snímku."""
+        return self._entry(worksheet)['slot_counts']
+
+    def invalidate(self, worksheet):
+        """Po vymazaní - ďalšie čítanie snímok obnoví (aj v ostatných replikách)."""
+        self.store.drop_snapshot(counter_day(worksheet))
+        self.invalidate_day(counter_day(worksheet))
+
+    def invalidate_day(self, day):
+        entry = self._entries.get(day)
+        if entry is not None:
+            entry['loaded_at'] = float('-inf')
+
+
+@st.cache_resource
+def get_today_snapshot():
+    """Jeden snímok dnešnej účasti pre celý proces."""
+    return TodaySnapshot(get_shared_store())
+
+
+def seed_counters(counters, snapshot, worksheet, force=False):
+    """Naplní počítadlá z denného hárku, ak ešte neboli naplnené (alebo pri force)."""
+    day = counter_day(worksheet)
+    if force or not counters.is_seeded(day):
+        counters.seed(day, snapshot.get(worksheet, force=force))
+    return counters
+
+
+def ensure_counters_seeded(worksheet, force=False):
+    """Naplnenie počítadiel procesu - pri chybe čítania hárku vyhodí výnimku."""
+    return seed_counters(get_slot_counters(), get_today_snapshot(), worksheet, force)
+
+
+def normalize_name(name):
+    """Normalizované meno - malé písmená, bez diakritiky a nadbytočných medzier."""
+    without_accents = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(without_accents.lower().split())
+
+
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def base62_encode(number):
+    if number == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+    return "".join(reversed(digits))
+
+
+def base62_decode(text):
+    number = 0
+    for char in text:
+        number = number * 62 + BASE62_ALPHABET.index(char)
+    return number
+
+
+def member_token_tag(member_id, key):
+    """HMAC podpis ID člena skrátený na MEMBER_TOKEN_TAG_LENGTH znakov."""
+    digest = hmac.new(key.encode('utf-8'), str(member_id).encode('utf-8'), hashlib.sha256).digest()
+    # nižšie rády base62 - vedúce cifry 64-bitového čísla majú malú entropiu
+    tag = base62_encode(int.from_bytes(digest[:8], 'big') % 62 ** MEMBER_TOKEN_TAG_LENGTH)
+    return tag.rjust(MEMBER_TOKEN_TAG_LENGTH, BASE62_ALPHABET[0])
+
+
+def create_member_token(member_id, key):
+    """Krátky podpísaný kód člena - base62 ID + podpis (napr. "G7Kx2Q")."""
+    return base62_encode(int(member_id)) + member_token_tag(int(member_id), key)
+
+
+def parse_member_token(token, key):
+    """ID člena z kódu, alebo None ak kód nie je platný (zlý formát alebo podpis)."""
+    token = str(token).strip()
+    if len(token) <= MEMBER_TOKEN_TAG_LENGTH or any(char not in BASE62_ALPHABET for char in token):
+        return None
+    member_id = base62_decode(token[:-MEMBER_TOKEN_TAG_LENGTH])
+    if not hmac.compare_digest(token[-MEMBER_TOKEN_TAG_LENGTH:], member_token_tag(member_id, key)):
+        return None
+    return member_id
+
+
+def get_member_token_key():
+    """Tajný kľúč pre členské kódy zo secrets (member_token_key), None ak nie je nastavený."""
+    try:
+        return st.secrets.get("member_token_key") or None
+    except Exception:
+        return None
+
+
+def load_roster(client, spreadsheet_id):
+    """
+    Zoznam členov z hárku ROSTER_SHEET_TITLE ako index ID → údaje člena.
+    
+    Zmena mena, členstva alebo času v hárku sa prejaví bez výmeny NFC
+    tagov - kód obsahuje len ID.
+    """
+    try:
+        worksheet = client.open_by_key(spreadsheet_id).worksheet(ROSTER_SHEET_TITLE)
+    except gspread.WorksheetNotFound:
+        return {}
+    roster = {}
+    for record in worksheet.get_all_records():
+        try:
+            member_id = int(record.get('ID'))
+        except (TypeError, ValueError):
+            continue
+        roster[member_id] = {
+            'name': str(record.get('Meno', '')).strip(),
+            'membership': str(record.get('Typ členstva', '')).strip(),
+            'time': str(record.get('Čas tréningu', '')).strip()
+        }
+    return roster
+
+
+class MemberRoster:
+    """
+    Načítaný zoznam členov pre proces - drží sa ROSTER_TTL sekúnd.
+    
+    Na rozdiel od st.cache_data ho môže naplniť aj zahrievanie na pozadí.
+    """
+
+    def __init__(self, spreadsheet_id):
+        self.spreadsheet_id = spreadsheet_id
+        self._lock = threading.Lock()
+        self._roster = None
+        self._loaded_at = float('-inf')
+
+    def get(self, client):
+        with self._lock:
+            if self._roster is None or time_module.monotonic() - self._loaded_at > ROSTER_TTL:
+                self._roster = load_roster(client, self.spreadsheet_id)
+                self._loaded_at = time_module.monotonic()
+            return self._roster
+
+
+@st.cache_resource
+def get_member_roster(spreadsheet_id):
+    return MemberRoster(spreadsheet_id)
+
+
+def get_roster(client, spreadsheet_id):
+    """Zoznam členov ID → údaje člena (z pamäte, po ROSTER_TTL znova z hárku)."""
+    return get_member_roster(spreadsheet_id).get(client)
+
+
+def resolve_member_token(client, spreadsheet_id, token):
+    """Údaje člena pre kód z URL, alebo None pre neplatný/neznámy kód."""
+    key = get_member_token_key()
+    if not key:
+        return None
+    member_id = parse_member_token(token, key)
+    if member_id is None:
+        return None
+    return get_roster(client, spreadsheet_id).get(member_id)
+
+
+def member_history_url(token):
+    """URL prehľadu "Moje tréningy" pre členský kód."""
+    return f"{APP_URL}/?view=history&m={token}"
+
+
+def member_checkin_url(client, spreadsheet_id, name, membership, time, auto=True):
+    """
+    URL pre QR/NFC - krátky podpísaný kód, ak je člen v zozname, inak plné URL.
+    
+    Kód sa vždy prihlasuje automaticky, auto=0 len predvyplní formulár.
+    """
+    key = get_member_token_key()
+    if key:
+        normalized = normalize_name(name)
+        for member_id, member in get_roster(client, spreadsheet_id).items():
+            if normalize_name(member['name']) == normalized:
+                url = f"{APP_URL}/?m={create_member_token(member_id, key)}"
+                return url if auto else f"{url}&auto=0"
+    
+    params = {
+        "name": name,
+        "membership": membership,
+        "time": time
+    }
+    if auto:
+        params["auto"] = "1"
+    query_string = "&".join([f"{k}={quote(str(v))}" for k, v in params.items()])
+    return f"{APP_URL}/?view=participant&{query_string}"
+
+
+class EntitlementLedger:
+    """
+    Evidencia nárokov členov (typ členstva, platnosť, zostávajúce vstupy).
+    
+    Drží sa v SharedStore podľa normalizovaného mena, takže kontrola pri
+    prihlásení je jedna transakcia bez čítania histórie a všetky repliky
+    vidia ten istý stav. Zmeny zrkadlí do hárku LEDGER_SHEET_TITLE len
+    zapisovateľ (s oneskorením), z hárku sa evidencia obnoví, ak je prázdna.
+    
+    Každý odpočítaný vstup sa zaznamená pod kľúčom prihlásenia
+    (entitlement_charges), takže refund vráti len to, čo sa naozaj odpočítalo.
+    """
+
+    # Ako dlho sa pamätajú odpočítané vstupy (vrátiť sa dajú len dnešné prihlásenia)
+    CHARGE_TTL = 2 * 86400
+
+    COLUMNS = ['Meno', 'Typ členstva', 'Platné do', 'Zostávajúce vstupy', 'Aktualizované']
+    FIELDS = ['name', 'membership', 'valid_until', 'remaining', 'updated']
+    SELECT = "SELECT name, membership, valid_until, remaining, updated FROM entitlements WHERE member = ?"
+
+    def __init__(self, store):
+        self.store = store
+
+    @classmethod
+    def _get(cls, db, key):
+        row = db.execute(cls.SELECT, (key,)).fetchone()
+        return dict(zip(cls.FIELDS, row)) if row else None
+
+    @staticmethod
+    def _put(db, key, entry):
+        db.execute(
+            "INSERT OR REPLACE INTO entitlements VALUES (?, ?, ?, ?, ?, ?)",
+            (key, entry['name'], entry['membership'], entry['valid_until'], entry['remaining'], entry['updated'])
+        )
+        SharedStore.bump_version(db, "entitlements_version")
+
+    def version(self):
+        return self.store.get_state("entitlements_version", "0")
+
+    def load(self, client, spreadsheet_id):
+        """Obnovenie prázdnej evidencie z hárku (prvé spustenie so zdieľaným stavom)."""
+        if self.store.query("SELECT 1 FROM entitlements LIMIT 1"):
+            return
+        try:
+            worksheet = client.open_by_key(spreadsheet_id).worksheet(LEDGER_SHEET_TITLE)
+        except gspread.WorksheetNotFound:
+            return
+        # Hárok sa číta mimo transakcie - zámok SharedStore sa nedrží počas volania API
+        entries = []
+        for record in worksheet.get_all_records():
+            name = str(record.get('Meno', '')).strip()
+            membership = str(record.get('Typ členstva', '')).strip()
+            if not normalize_name(name) or not membership:
+                continue
+            remaining = str(record.get('Zostávajúce vstupy', '')).strip()
+            try:
+                remaining = int(remaining) if remaining != '' else None
+            except ValueError:
+                remaining = None
+            entries.append((
+                normalize_name(name), name, membership, record.get('Platné do') or None,
+                remaining, str(record.get('Aktualizované', ''))
+            ))
+        with self.store.transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO entitlements VALUES (?, ?, ?, ?, ?, ?)", entries)
+
+    def _new_entry(self, name, membership, today):
+        rule = MEMBERSHIP_ENTITLEMENTS.get(membership, {})
+        days = rule.get("days")
+        return {
+            'name': name,
+            'membership': membership,
+            'valid_until': (today + timedelta(days=days)).isoformat() if days else None,
+            'remaining': rule.get("entries"),
+            'updated': datetime.now().isoformat(timespec='seconds')
+        }
+
+    @staticmethod
+    def _problem(entry, today):
+        """Popis problému s nárokom (prázdny reťazec = v poriadku)."""
+        if entry['valid_until'] and today.isoformat() > entry['valid_until']:
+            valid_until = datetime.strptime(entry['valid_until'], "%Y-%m-%d").strftime("%d.%m.%Y")
+            return f"🚩 Platnosť skončila {valid_until}"
+        if entry['remaining'] is not None and entry['remaining'] <= 0:
+            return "🚩 Vyčerpané vstupy"
+        return ""
+
+    @staticmethod
+    def _changed(entry, membership):
+        """Popis zmeny typu členstva oproti evidencii (prázdny reťazec = bez zmeny)."""
+        if entry['membership'] == membership:
+            return ""
+        return f"🚩 zmena typu členstva {entry['membership']} → {membership}"
+
+    def use(self, name, membership, charge, today=None):
+        """
+        Overenie a odpočítanie vstupu pri prihlásení.
+        
+        Vráti (povolené, poznámka) - poznámka je prázdna, ak je nárok
+        v poriadku, inak popisuje problém pre trénera. Vstup sa odpočíta
+        len bez problému a zaznamená sa pod kľúčom charge (pre refund).
+        Zmenu typu členstva evidencia neprevezme - nárok zostane pôvodný,
+        kým ho tréner neobnoví (renew).
+        """
+        today = today or date.today()
+        rule = MEMBERSHIP_ENTITLEMENTS.get(membership, {})
+        key = normalize_name(name)
+        with self.store.transaction() as db:
+            entry = self._get(db, key)
+            if entry is None:
+                entry = self._new_entry(name, membership, today)
+            elif entry['membership'] != membership and rule.get("first_visit_only"):
+                return False, f"🚩 {membership} je len pre nových členov"
+            
+            problem = self._changed(entry, membership) or self._problem(entry, today)
+            if problem:
+                return not rule.get("block"), problem
+            if entry['remaining'] is not None:
+                entry['remaining'] -= 1
+                db.execute("DELETE FROM entitlement_charges WHERE created < ?", (time_module.time() - self.CHARGE_TTL,))
+                db.execute(
+                    "INSERT OR REPLACE INTO entitlement_charges VALUES (?, ?, ?, ?)",
+                    (charge, key, membership, time_module.time())
+                )
+            entry['updated'] = datetime.now().isoformat(timespec='seconds')
+            self._put(db, key, entry)
+            return True, ""
+
+    def refund(self, charge):
+        """
+        Vrátenie vstupu (neúspešný zápis alebo vymazané prihlásenie) - len ak
+        ho prihlásenie charge odpočítalo a člen má stále to isté členstvo.
+        """
+        with self.store.transaction() as db:
+            row = db.execute(
+                "SELECT member, membership FROM entitlement_charges WHERE charge = ?", (charge,)
+            ).fetchone()
+            if row is None:
+                return
+            db.execute("DELETE FROM entitlement_charges WHERE charge = ?", (charge,))
+            key, membership = row
+            entry = self._get(db, key)
+            if entry and entry['membership'] == membership and entry['remaining'] is not None:
+                entry['remaining'] += 1
+                self._put(db, key, entry)
+
+    def renew(self, name, membership, today=None):
+        """Obnovenie nároku (napr. po zaplatení alebo zmene typu) podľa typu členstva."""
+        key = normalize_name(name)
+        with self.store.transaction() as db:
+            # Vstupy odpočítané z pôvodného nároku sa do nového nevracajú
+            db.execute("DELETE FROM entitlement_charges WHERE member = ?", (key,))
+            self._put(db, key, self._new_entry(name, membership, today or date.today()))
+
+    def status(self, name, membership, today=None):
+        """Aktuálny problém s nárokom člena pre daný typ členstva (prázdny reťazec = v poriadku)."""
+        rows = self.store.query(self.SELECT, (normalize_name(name),))
+        if not rows:
+            return ""
+        entry = dict(zip(self.FIELDS, rows[0]))
+        return self._changed(entry, membership) or self._problem(entry, today or date.today())
+
+    def mirror(self, client, spreadsheet_id):
+        """Zápis celej evidencie do hárku LEDGER_SHEET_TITLE jedným update."""
+        rows = [
+            [name, membership, valid_until or "", "" if remaining is None else remaining, updated]
+            for name, membership, valid_until, remaining, updated in self.store.query(
+                "SELECT name, membership, valid_until, remaining, updated FROM entitlements ORDER BY member"
+            )
+        ]
+        spreadsheet = client.open_by_key(spreadsheet_id)
+        try:
+            worksheet = spreadsheet.worksheet(LEDGER_SHEET_TITLE)
+        except gspread.WorksheetNotFound:
+            worksheet = spreadsheet.add_worksheet(
+                title=LEDGER_SHEET_TITLE, rows=len(rows) + 100, cols=len(self.COLUMNS)
+            )
+        if worksheet.row_count < len(rows) + 1:
+            worksheet.add_rows(len(rows) + 100 - worksheet.row_count)
+        worksheet.update('A1', [self.COLUMNS] + rows)
+
+
+def _ledger_mirror_loop(ledger, client, spreadsheet_id):
+    """Slučka zrkadlenia - zapisovateľ po LEDGER_MIRROR_DELAY zapíše zmenenú evidenciu do hárku."""
+    mirrored = ledger.version()
+    while True:
+        time_module.sleep(LEDGER_MIRROR_DELAY)
+        try:
+            version = ledger.version()
+            if version == mirrored or not ledger.store.acquire_lease(WRITER_LEASE, WRITER_LEASE_TTL):
+                continue
+            ledger.mirror(client, spreadsheet_id)
+            mirrored = version
+        except Exception:
+            logger.exception("Zrkadlenie evidencie členstiev zlyhalo")
+
+
+@st.cache_resource
+def get_entitlement_ledger(_client, spreadsheet_id):
+    """Evidencia nárokov pre celý proces - pri prvom volaní sa prípadne obnoví z hárku a spustí zrkadlenie."""
+    ledger = EntitlementLedger(get_shared_store())
+    ledger.load(_client, spreadsheet_id)
+    threading.Thread(
+        target=_ledger_mirror_loop,
+        args=(ledger, _client, spreadsheet_id),
+        name="ledger-mirror",
+        daemon=True
+    ).start()
+    return ledger
+
+
+class VisitLog:
+    """
+    Tréningy všetkých dní v SharedStore - zdroj pre rebríček, históriu
+    členov, agregáty aj mesačný report, spoločný pre všetky repliky.
+    
+    Uzavreté dni zapisuje ClosedDayFeed z hárkov - deň sa nahradí celý,
+    takže opakované čítanie nič nezdvojí a ručné opravy v hárku sa
+    prejavia. Dnešné prihlásenia a vymazania sa zapisujú hneď. Rebríčky
+    (tabuľka rankings) sa menia v tej istej transakcii ako tréningy.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def scopes(day, training_time):
+        """Rebríčky, do ktorých patrí tréning v daný deň a čas."""
+        return ["all", f"month:{day[:7]}", f"slot:{training_time}"]
+
+    def _rank(self, db, changes):
+        """Zmena rebríčkov - changes je zoznam (deň, člen, meno, čas, +1/-1)."""
+        deltas = {}
+        for day, member, name, training_time, delta in changes:
+            for scope in self.scopes(day, training_time):
+                count, _ = deltas.get((scope, member), (0, name))
+                deltas[(scope, member)] = (count + delta, name)
+        deltas = [(scope, member, name, count) for (scope, member), (count, name) in deltas.items() if count]
+        db.executemany(
+            "INSERT INTO rankings VALUES (?, ?, ?, ?) ON CONFLICT (scope, member) DO UPDATE SET "
+            "count = count + excluded.count, "
+            "name = CASE WHEN excluded.count > 0 THEN excluded.name ELSE name END",
+            deltas
+        )
+        db.executemany(
+            "DELETE FROM rankings WHERE scope = ? AND member = ? AND count <= 0",
+            [(scope, member) for scope, member, _, count in deltas if count < 0]
+        )
+
+    def add(self, day, name, training_time, membership):
+        """Dnešné prihlásenie."""
+        visit = (day, normalize_name(name), name, training_time)
+        with self.store.transaction() as db:
+            db.execute(
+                "INSERT INTO visits (day, member, name, slot, membership) VALUES (?, ?, ?, ?, ?)",
+                visit + (membership,)
+            )
+            self._rank(db, [visit + (1,)])
+
+    def remove(self, day, name, training_time):
+        """Vymazané prihlásenie - jeden tréning člena v daný deň a čas."""
+        member = normalize_name(name)
+        with self.store.transaction() as db:
+            cursor = db.execute(
+                "DELETE FROM visits WHERE id = (SELECT id FROM visits "
+                "WHERE day = ? AND member = ? AND slot = ? ORDER BY id DESC LIMIT 1)",
+                (day, member, training_time)
+            )
+            if cursor.rowcount:
+                self._rank(db, [(day, member, name, training_time, -1)])
+
+    def replace_days(self, days, rows):
+        """
+        Zápis uzavretých dní z hárkov - riadky (Dátum, Meno, Čas tréningu,
+        Typ členstva) nahradia doterajšie tréningy týchto dní.
+        """
+        rows = rows.assign(member=member_keys(rows['Meno']), name=rows['Meno'].astype(str).str.strip())
+        rows = rows[rows['member'] != ""]
+        visits = list(zip(
+            rows['Dátum'].astype(str), rows['member'], rows['name'],
+            rows['Čas tréningu'].astype(str), rows['Typ členstva'].astype(str)
+        ))
+        with self.store.transaction() as db:
+            changes = []
+            for day in days:
+                old = db.execute("SELECT day, member, name, slot FROM visits WHERE day = ?", (day,)).fetchall()
+                changes.extend(visit + (-1,) for visit in old)
+            changes.extend(visit[:4] + (1,) for visit in visits)
+            self._rank(db, changes)
+            db.executemany("DELETE FROM visits WHERE day = ?", [(day,) for day in days])
+            db.executemany("INSERT INTO visits (day, member, name, slot, membership) VALUES (?, ?, ?, ?, ?)", visits)
+            db.executemany("INSERT OR IGNORE INTO closed_days VALUES (?)", [(day,) for day in days])
+            db.execute("INSERT OR REPLACE INTO state VALUES ('last_closed_day', ?)", (days[-1],))
+            SharedStore.bump_version(db, "closed_version")
+
+    def reset(self):
+        """Prepočet z histórie - ďalšie čítanie uzavretých dní začne od prvého hárku."""
+        with self.store.transaction() as db:
+            db.execute("DELETE FROM state WHERE key = 'last_closed_day'")
+
+    def mark_ready(self, through):
+        """
+        Všetky uzavreté dni až po deň through sú načítané (aj dni bez hárku) -
+        rebríček a história členov sú úplné, mesačný report podľa toho vie,
+        či je mesiac celý.
+        """
+        with self.store.transaction() as db:
+            db.execute("INSERT OR REPLACE INTO state VALUES ('history_ready', '1')")
+            db.execute("INSERT OR REPLACE INTO state VALUES ('closed_through', ?)", (day_sheet_title(through),))
+
+    def is_ready(self):
+        """Či už prebehlo celé načítanie uzavretých dní (na novom stave chýba história)."""
+        return self.store.get_state("history_ready", "") == "1"
+
+    def last_closed_day(self):
+        return self.store.get_state("last_closed_day", "")
+
+    def members_on(self, day):
+        """Kľúče členov s tréningom v daný deň (dnes aj tie, čo ešte čakajú vo fronte)."""
+        return {member for (member,) in self.store.query(
+            "SELECT DISTINCT member FROM visits WHERE day = ?", (day_sheet_title(day),)
+        )}
+
+    def closed_version(self):
+        """Mení sa s každým zápisom uzavretých dní - agregáty sa podľa nej prepočítajú."""
+        return self.store.get_state("closed_version", "0")
+
+    def closed_days(self):
+        return [day for (day,) in self.store.query("SELECT day FROM closed_days ORDER BY day")]
+
+    def daily_counts(self):
+        """Počty uzavretých dní podľa dátumu, času tréningu a typu členstva."""
+        rows = self.store.query(
+            "SELECT day, slot, membership, COUNT(*) FROM visits "
+            "WHERE day IN (SELECT day FROM closed_days) GROUP BY day, slot, membership ORDER BY day"
+        )
+        return pd.DataFrame(rows, columns=['Dátum', 'Čas tréningu', 'Typ členstva', 'Počet'])
+
+    def member_months(self):
+        """Tréningy členov po mesiacoch (uzavreté dni) - meno z posledného tréningu v mesiaci."""
+        rows = self.store.query(
+            "SELECT member, name, substr(day, 1, 7) AS month, COUNT(*), MAX(day) FROM visits "
+            "WHERE day IN (SELECT day FROM closed_days) GROUP BY member, month"
+        )
+        return pd.DataFrame(rows, columns=['Kľúč', 'Meno', 'Mesiac', 'Tréningy', 'Posledný'])
+
+
+@st.cache_resource
+def get_visit_log():
+    """Tréningy nad zdieľaným stavom - jedna inštancia pre proces."""
+    return VisitLog(get_shared_store())
+
+
+class Leaderboard:
+    """
+    Rebríček najaktívnejších členov - za mesiac, podľa času tréningu a celkovo.
+    
+    Počty drží tabuľka rankings v SharedStore (mení ju VisitLog spolu
+    s tréningami), poradie aj top N sú dopyty cez index (scope, count),
+    takže zobrazenie rebríčka nečíta žiadne hárky.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def rank(self, scope, name):
+        """(poradie, počet, počet členov v rebríčku) pre člena, alebo None."""
+        rows = self.store.query(
+            "SELECT count FROM rankings WHERE scope = ? AND member = ?", (scope, normalize_name(name))
+        )
+        if not rows:
+            return None
+        count = rows[0][0]
+        ahead = self.store.query("SELECT COUNT(*) FROM rankings WHERE scope = ? AND count > ?", (scope, count))[0][0]
+        total = self.store.query("SELECT COUNT(*) FROM rankings WHERE scope = ?", (scope,))[0][0]
+        return ahead + 1, count, total
+
+    def top(self, scope, n=10):
+        """Top N pre rebríček ako zoznam (meno, počet)."""
+        return self.store.query(
+            "SELECT name, count FROM rankings WHERE scope = ? ORDER BY count DESC, member LIMIT ?", (scope, n)
+        )
+
+
+@st.cache_resource
+def get_leaderboard():
+    """Rebríček nad zdieľaným stavom - jedna inštancia pre proces."""
+    return Leaderboard(get_shared_store())
+
+
+def show_member_rank(worksheet, name):
+    """Poradie člena v mesačnom rebríčku hneď po prihlásení (kým sa história načítava, nič)."""
+    if not get_visit_log().is_ready():
+        return
+    result = get_leaderboard().rank(f"month:{worksheet.title[:7]}", name)
+    if result:
+        rank, count, total = result
+        st.info(f"🏆 Tento mesiac si na **{rank}. mieste** z {total} ({count} tréningov)")
+
+
+class MemberHistory:
+    """
+    Tréningy jednotlivých členov - dopyt nad tréningami v SharedStore cez
+    index (člen, deň). Zobrazenie histórie člena nečíta žiadne hárky.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def of(self, name):
+        """Tréningy člena [(deň, čas)] zoradené od najstaršieho."""
+        return self.store.query(
+            "SELECT day, slot FROM visits WHERE member = ? ORDER BY day, slot", (normalize_name(name),)
+        )
+
+
+@st.cache_resource
+def get_member_history():
+    """História členov nad zdieľaným stavom - jedna inštancia pre proces."""
+    return MemberHistory(get_shared_store())
+
+
+def training_streak(visits, today=None):
+    """Počet po sebe idúcich týždňov s tréningom (aktuálny týždeň sa nepreruší, kým neskončí)."""
+    today = today or date.today()
+    weeks = {datetime.strptime(day, "%Y-%m-%d").date().isocalendar()[:2] for day, _ in visits}
+    week_start = today - timedelta(days=today.weekday())
+    if week_start.isocalendar()[:2] not in weeks:
+        week_start -= timedelta(days=7)
+    streak = 0
+    while week_start.isocalendar()[:2] in weeks:
+        streak += 1
+        week_start -= timedelta(days=7)
+    return streak
+
+
+class RateLimiter:
+    """
+    Posuvné okno pokusov podľa kľúča (odtlačok klienta alebo meno).
+    
+    Pre každý kľúč sa drží fronta časov posledných pokusov, kontrola aj
+    zápis sú O(1) amortizovane. Odmietnuté pokusy sa počítajú pre trénera.
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._last_cleanup = time_module.monotonic()
+        self.rejected = 0
+
+    def _prune(self, key, now):
+        hits = self._hits.get(key)
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        return hits
+
+    def _cleanup(self, now):
+        """Odstránenie kľúčov bez pokusov v okne, aby pamäť nerástla."""
+        if now - self._last_cleanup < self.window:
+            return
+        for key in [key for key in self._hits if not self._prune(key, now)]:
+            del self._hits[key]
+        self._last_cleanup = now
+
+    def is_limited(self, key):
+        """Kontrola bez započítania pokusu."""
+        now = time_module.monotonic()
+        with self._lock:
+            hits = self._prune(key, now)
+            return bool(hits) and len(hits) >= self.limit
+
+    def hit(self, key):
+        """Započítanie pokusu - vráti False, ak je limit prekročený."""
+        now = time_module.monotonic()
+        with self._lock:
+            self._cleanup(now)
+            hits = self._prune(key, now)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            if len(hits) >= self.limit:
+                self.rejected += 1
+                return False
+            hits.append(now)
+            return True
+
+    def reject(self):
+        """Započítanie pokusu odmietnutého mimo hit() (napr. pri kontrole is_limited)."""
+        with self._lock:
+            self.rejected += 1
+
+    def active_keys(self):
+        with self._lock:
+            return len(self._hits)
+
+
+@st.cache_resource
+def get_rate_limiter(kind):
+    """Limiter pre daný druh kľúča ("client" alebo "name") zdieľaný v procese."""
+    limit, window = RATE_LIMITS[kind]
+    try:
+        limit, window = st.secrets.get("rate_limits", {}).get(kind, (limit, window))
+    except Exception:
+        pass
+    return RateLimiter(int(limit), float(window))
+
+
+def client_fingerprint():
+    """
+    Odtlačok klienta - IP, ktorú pridal reverse proxy, inak ID session.
+    
+    Berie sa posledná adresa v X-Forwarded-For (pridaná našou proxy) -
+    prvé položky aj User-Agent posiela klient a môže ich meniť pri každom pokuse.
+    """
+    context = getattr(st, "context", None)
+    headers = getattr(context, "headers", None) if context else None
+    forwarded = headers.get("X-Forwarded-For", "").split(",")[-1].strip() if headers else ""
+    if forwarded:
+        raw = forwarded
+    else:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        raw = ctx.session_id if ctx else ""
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def allow_checkin_attempt(name):
+    """Kontrola limitov pre pokus o prihlásenie - volá sa pred akýmkoľvek prístupom k Sheets."""
+    if not get_rate_limiter("client").hit(client_fingerprint()):
+        return False
+    return get_rate_limiter("name").hit(normalize_name(name))
+
+
+def checkin_dedupe_key(day, name, training_time):
+    return f"{day}|{normalize_name(name)}|{training_time}"
+
+
+def check_in(worksheet, client, name, membership_type, training_time):
+    """Prihlásenie účastníka - duplicity, kontrola kapacity, zápis do frontu a počítadlá."""
+    try:
+        counters = ensure_counters_seeded(worksheet)
+    except Exception as e:
+        st.error(f"Chyba pri načítaní dát: {e}")
+        return False
+    day = counter_day(worksheet)
+    
+    # Opakované ťuknutie / načítanie s auto=1 - ten istý deň, meno a čas
+    store = get_shared_store()
+    dedupe_key = checkin_dedupe_key(day, name, training_time)
+    if not store.claim(dedupe_key, CHECKIN_DEDUPE_TTL):
+        st.success(f"✅ Na tréning o {training_time} si už dnes prihlásený/á.")
+        return False
+    
+    # Evidencia členstiev a tréningy (rebríček) sú spoločné pre všetky pobočky
+    ledger = get_entitlement_ledger(client, get_spreadsheet_id())
+    allowed, problem = ledger.use(name, membership_type, dedupe_key)
+    if not allowed:
+        store.release(dedupe_key)
+        st.warning(f"⚠️ {problem}. Prosím, ohlás sa u trénera.")
+        return False
+    
+    # Kapacita, počet a zaradenie do frontu sú jedna transakcia - do hárku
+    # riadok zapíše replika, ktorá je zapisovateľom (_checkin_writer_loop)
+    row = [datetime.now().strftime("%H:%M:%S"), name, membership_type, training_time, problem]
+    try:
+        added = counters.try_add(day, training_time, membership_type, get_slot_capacity(training_time), row=row)
+    except Exception as e:
+        st.error(f"Chyba pri ukladaní: {e}")
+        added = None
+    if not added:
+        store.release(dedupe_key)
+        ledger.refund(dedupe_key)
+        if added is False:
+            st.warning(f"⚠️ Tréning o {training_time} je už plne obsadený.")
+        return False
+    
+    get_visit_log().add(worksheet.title, name, training_time, membership_type)
+    if problem:
+        st.warning(f"⚠️ {problem}. Prosím, ohlás sa u trénera.")
+    return True
+
+
+def remove_attendance(worksheet, client, name, timestamp, membership_type, training_time=""):
+    """
+    Vymazanie záznamu z počítadiel a z hárku - riadok, ktorý ešte čaká vo
+    fronte, sa len zruší (do hárku sa už nezapíše).
+    """
+    day = counter_day(worksheet)
+    counters = get_slot_counters()
+    row = [timestamp, name, membership_type, training_time]
+    if not counters.withdraw(day, row):
+        if not delete_attendance(worksheet, name, timestamp, membership_type, training_time):
+            return False
+        counters.remove(day, training_time, membership_type, row=row)
+        get_today_snapshot().invalidate(worksheet)
+    dedupe_key = checkin_dedupe_key(day, name, training_time)
+    get_shared_store().release(dedupe_key)
+    get_entitlement_ledger(client, get_spreadsheet_id()).refund(dedupe_key)
+    get_visit_log().remove(worksheet.title, name, training_time)
+    return True
+
+
+def discard_checkin(client, spreadsheet_id, title, row):
+    """
+    Dokončenie zahodenia nezapísaného prihlásenia (počet už odpočítal
+    SlotCounters.discard) - vráti duplicity, vstup a tréning.
+    """
+    _, name, membership_type, training_time = row[:4]
+    day = f"{title}@{spreadsheet_id}"
+    dedupe_key = checkin_dedupe_key(day, name, training_time)
+    get_shared_store().release(dedupe_key)
+    get_entitlement_ledger(client, get_spreadsheet_id()).refund(dedupe_key)
+    get_visit_log().remove(title, name, training_time)
+
+
+def dead_letters_section(client):
+    """Sekcia trénera - prihlásenia, ktoré sa nepodarilo zapísať do Sheets."""
+    store = get_shared_store()
+    dead_letters = store.dead_letters()
+    if not dead_letters:
+        return
+    
+    st.markdown("### 📮 Nezapísané prihlásenia")
+    st.warning(
+        f"⚠️ {len(dead_letters)} prihlásení sa nepodarilo zapísať do Sheets. "
+        "Po oprave (napr. obnovení hárku) ich zapíš znova, inak ich zahoď."
+    )
+    for item_id, spreadsheet_id, title, row, attempts, error in dead_letters:
+        col1, col2, col3 = st.columns([4, 1, 1])
+        with col1:
+            st.markdown(f"**{row[1]}** - {row[2]}, {title} {row[3]} ({row[0]})")
+            st.caption(f"{attempts} pokusov, chyba: {error or '-'}")
+        with col2:
+            if st.button("🔁 Zapísať", key=f"requeue_{item_id}", use_container_width=True):
+                store.requeue(item_id)
+                st.rerun()
+        with col3:
+            if st.button("🗑️ Zahodiť", key=f"discard_{item_id}", use_container_width=True):
+                discarded = get_slot_counters().discard(f"{title}@{spreadsheet_id}", item_id)
+                if discarded is not None:
+                    discard_checkin(client, spreadsheet_id, title, discarded)
+                st.rerun()
+
+
+def format_slot_option(day, training_time):
+    """Popis času tréningu v selectboxe s aktuálnou obsadenosťou."""
+    counters = get_slot_counters()
+    if not counters.is_seeded(day):
+        return training_time
+    count = counters.slot_total(day, training_time)
+    capacity = get_slot_capacity(training_time)
+    if capacity:
+        full = " - plné" if count >= capacity else ""
+        return f"{training_time} ({count}/{capacity}{full})"
+    return f"{training_time} ({count} prihlásených)"
+
+
+def get_all_worksheets(client, spreadsheet_id):
+    """
+    Získanie všetkých hárkov zo spreadsheetu.
+    
+    Chybu nezakrýva prázdnym zoznamom - čitatelia histórie by ho inak
+    považovali za spreadsheet bez hárkov.
+    """
+    return client.open_by_key(spreadsheet_id).worksheets()
+
+
+class SheetIndex:
+    """
+    Zoradený index denných hárkov (názov YYYY-MM-DD → worksheet).
+    
+    Hárky, ktorých názov nie je dátum, sa vyradia hneď pri načítaní. Výber
+    hárkov pre obdobie je binárne vyhľadávanie v zoradených názvoch, takže
+    sa číta len to, čo do obdobia patrí.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._titles = []
+        self._worksheets = {}
+        self._loaded_at = float('-inf')
+
+    def refresh(self, client, spreadsheet_id):
+        """Načítanie zoznamu hárkov zo spreadsheetu - pri chybe zostane pôvodný index a chyba sa vyhodí."""
+        worksheets = get_all_worksheets(client, spreadsheet_id)
+        day_sheets = {ws.title: ws for ws in worksheets if is_day_sheet_title(ws.title)}
+        with self._lock:
+            self._worksheets = day_sheets
+            self._titles = sorted(day_sheets)
+            self._loaded_at = time_module.monotonic()
+
+    def is_stale(self):
+        return time_module.monotonic() - self._loaded_at > SHEET_INDEX_TTL
+
+    def add(self, worksheet):
+        """Pridanie novo vytvoreného hárku bez opätovného načítania zoznamu."""
+        with self._lock:
+            if worksheet.title not in self._worksheets:
+                bisect.insort(self._titles, worksheet.title)
+            self._worksheets[worksheet.title] = worksheet
+
+    def months(self):
+        """Mesiace (YYYY-MM), pre ktoré existujú denné hárky, od najnovšieho."""
+        with self._lock:
+            return sorted({title[:7] for title in self._titles}, reverse=True)
+
+    def between(self, start=None, end=None):
+        """Hárky pre dni v intervale [start, end] (None = bez obmedzenia), zoradené."""
+        with self._lock:
+            lo = bisect.bisect_left(self._titles, day_sheet_title(start)) if start else 0
+            hi = bisect.bisect_right(self._titles, day_sheet_title(end)) if end else len(self._titles)
+            return [self._worksheets[title] for title in self._titles[lo:hi]]
+
+
+class SheetCatalog:
+    """
+    Indexy denných hárkov a otvorené denné hárky všetkých spreadsheetov.
+    
+    Jedna inštancia pre proces (get_sheet_catalog) - vlákna na pozadí ju
+    dostanú zo skriptu a volajú len jej metódy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._day_sheets = {}
+
+    def index(self, client, spreadsheet_id):
+        """Index denných hárkov pre spreadsheet - obnovuje sa po SHEET_INDEX_TTL."""
+        with self._lock:
+            index = self._indexes.setdefault(spreadsheet_id, SheetIndex())
+        if index.is_stale():
+            index.refresh(client, spreadsheet_id)
+        return index
+
+    def day_sheet(self, client, spreadsheet_id, day):
+        """
+        Denný hárok pre deň - otvorí sa raz za proces, potom sa berie z pamäte.
+        
+        Hárok zvyčajne vopred vytvoril plánovač, vytvárame ho len ako záloha.
+        """
+        with self._lock:
+            worksheet = self._day_sheets.get((spreadsheet_id, day))
+        if worksheet is not None:
+            return worksheet
+        
+        spreadsheet = client.open_by_key(spreadsheet_id)
+        try:
+            worksheet = spreadsheet.worksheet(day_sheet_title(day))
+        except gspread.WorksheetNotFound:
+            worksheet = create_day_sheet(spreadsheet, day)
+            with self._lock:
+                index = self._indexes.get(spreadsheet_id)
+            if index is not None:
+                index.add(worksheet)
+        
+        with self._lock:
+            # Staršie dni už nepotrebujeme
+            self._day_sheets = {
+                key: value for key, value in self._day_sheets.items() if key[1] >= day - timedelta(days=1)
+            }
+            self._day_sheets[(spreadsheet_id, day)] = worksheet
+        return worksheet
+
+
+@st.cache_resource
+def get_sheet_catalog():
+    """Indexy a denné hárky - jeden katalóg pre proces."""
+    return SheetCatalog()
+
+
+def get_sheet_index(client, spreadsheet_id):
+    """Index denných hárkov pre spreadsheet - zdieľaný v procese, obnovuje sa po SHEET_INDEX_TTL."""
+    return get_sheet_catalog().index(client, spreadsheet_id)
+
+
+def history_sheets_between(client, router, catalog, start=None, end=None):
+    """Denné hárky za obdobie zo všetkých pobočiek ako zoznam (pobočka, worksheet), podľa dátumu."""
+    sheets = []
+    for location, shard_id in router.shards_for(start, end):
+        sheets.extend((location, ws) for ws in catalog.index(client, shard_id).between(start, end))
+    return sorted(sheets, key=lambda item: item[1].title)
+
+
+def history_months(client, spreadsheet_id):
+    """Mesiace (YYYY-MM) s dennými hárkami zo všetkých pobočiek, od najnovšieho."""
+    months = set()
+    for _, shard_id in get_shard_router(spreadsheet_id).shards_for():
+        months.update(get_sheet_index(client, shard_id).months())
+    return sorted(months, reverse=True)
+
+
+def read_closed_days(client, router, catalog, start, end):
+    """
+    Riadky dní [start, end] zo všetkých pobočiek - (dni, DataFrame, úplné).
+    
+    Deň sa vráti, len ak sa načítali hárky všetkých pobočiek, a len ako
+    súvislý úsek od začiatku - pri chybe hárku sa tento deň aj nasledujúce
+    vynechajú (úplné = False) a skúsia sa pri ďalšom čítaní.
+    """
+    sheets = history_sheets_between(client, router, catalog, start, end)
+    
+    def read_sheet(item):
+        location, worksheet = item
+        try:
+            df = sheet_frame(worksheet.get_all_records(), worksheet.title)
+            return df.assign(Dátum=worksheet.title, Pobočka=location)
+        except Exception as e:
+            logger.warning("Hárok %s (%s) sa nepodarilo načítať: %s", worksheet.title, location, e)
+            return None
+    
+    read, complete = [], True
+    for (_, worksheet), df in zip(sheets, ordered_parallel_map(read_sheet, sheets)):
+        if df is None:
+            read = [(title, frame) for title, frame in read if title < worksheet.title]
+            complete = False
+            break
+        read.append((worksheet.title, df))
+    
+    days = sorted({title for title, _ in read})
+    frames = [frame for _, frame in read if not frame.empty]
+    if frames:
+        return days, pd.concat(frames, ignore_index=True), complete
+    return days, pd.DataFrame(columns=SHEET_HEADER + ['Dátum', 'Pobočka']), complete
+
+
+def attendance_between(client, spreadsheet_id, start=None, end=None):
+    """
+    Dáta o účasti za obdobie [start, end] zo všetkých pobočiek.
+    
+    Hárky sa vyberú binárnym vyhľadávaním v zoradenom indexe názvov dní
+    (SheetIndex.between), takže sa načítajú len dni z obdobia a ne-denné
+    hárky sa vôbec nečítajú. Stĺpce Dátum a Pobočka určujú zdroj riadku.
+    Ak sa niektorý hárok nepodarí načítať, vyhodí RuntimeError - neúplné
+    obdobie sa nevydáva za úplné.
+    """
+    days, df, complete = read_closed_days(client, get_shard_router(spreadsheet_id), get_sheet_catalog(), start, end)
+    if not complete:
+        raise RuntimeError(f"hárky za obdobie sa podarilo načítať len do {days[-1] if days else '-'}")
+    return df
+
+
+class ClosedDayFeed:
+    """
+    Jeden čitateľ uzavretých dní pre všetky agregáty histórie.
+    
+    Hárky novo uzavretých dní sa načítajú raz (max. raz za deň, pri chybe
+    znova pri ďalšom volaní) a zapíšu do VisitLog, odkiaľ si ich berú
+    heatmapa, retencia, rebríček aj história členov. Hárky číta vždy len
+    jedna replika (zámok CLOSED_DAYS_LEASE), ostatné vidia výsledok v SharedStore.
+    """
+
+    def __init__(self, visits, router, catalog):
+        self.visits = visits
+        self.router = router
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        self._checked_on = None
+
+    def update(self, client):
+        """Doplnenie dní, ktoré sa uzavreli od posledného behu."""
+        today = date.today()
+        if self._checked_on == today:
+            return
+        # Kým číta iné vlákno (napr. zahrievanie), požiadavka nečaká
+        if not self._lock.acquire(blocking=False):
+            return
+        store = self.visits.store
+        try:
+            if self._checked_on == today or not store.acquire_lease(CLOSED_DAYS_LEASE, CLOSED_DAYS_LEASE_TTL):
+                return
+            try:
+                watermark = self.visits.last_closed_day()
+                start = None
+                if watermark:
+                    start = datetime.strptime(watermark, "%Y-%m-%d").date() + timedelta(days=1)
+                yesterday = today - timedelta(days=1)
+                try:
+                    days, rows, complete = read_closed_days(client, self.router, self.catalog, start, yesterday)
+                except Exception:
+                    # Bez zoznamu hárkov sa nezapíše nič, skúsi sa pri ďalšom volaní
+                    logger.exception("Zoznam hárkov sa nepodarilo načítať")
+                    return
+                if days:
+                    self.visits.replace_days(days, rows)
+                if complete:
+                    self.visits.mark_ready(yesterday)
+                    self._checked_on = today
+            finally:
+                store.release_lease(CLOSED_DAYS_LEASE)
+        finally:
+            self._lock.release()
+
+    def rebuild(self, client):
+        """Nové načítanie všetkých uzavretých dní (po importe alebo čistení histórie)."""
+        self.visits.reset()
+        self._checked_on = None
+        self.update(client)
+
+
+@st.cache_resource
+def get_closed_day_feed(spreadsheet_id):
+    """Čitateľ uzavretých dní - jeden pre proces."""
+    return ClosedDayFeed(get_visit_log(), get_shard_router(spreadsheet_id), get_sheet_catalog())
+
+
+class AttendanceAggregates:
+    """
+    Heatmapa a odhad účasti z uzavretých dní.
+    
+    Denné počty podľa času tréningu a typu členstva sa berú jedným GROUP BY
+    nad tréningami vo VisitLog, a to len keď ClosedDayFeed zapíše ďalšie
+    dni (zmení sa verzia) - zobrazenie heatmapy ani odhad nečítajú hárky.
+    
+    Odhad = priemer pre deň v týždni a čas tréningu × trend posledných
+    FORECAST_TREND_DAYS dní. Model sa prepočíta len po uzavretí dňa.
+    """
+
+    def __init__(self, visits):
+        self.visits = visits
+        self._lock = threading.Lock()
+        self._version = None
+        self.last_closed_day = ""
+        self.closed_days = []
+        self.daily = pd.DataFrame(columns=['Dátum', 'Čas tréningu', 'Typ členstva', 'Počet'])
+        self._slot_totals = pd.DataFrame(0, index=range(7), columns=TRAINING_TIMES)
+        self._days_per_weekday = pd.Series(0, index=range(7))
+        self.membership_mix = pd.Series(dtype='int64')
+        self._model = None
+
+    def sync(self):
+        """Prepočet matice súčtov, ak pribudli uzavreté dni (vektorizovaný pivot)."""
+        version = self.visits.closed_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            daily = self.visits.daily_counts()
+            days = self.visits.closed_days()
+            
+            # Priemer je na otvorený deň - počítajú sa aj dni bez jediného prihlásenia
+            day_weekdays = pd.to_datetime(pd.Series(days, dtype=object), format='%Y-%m-%d').dt.weekday
+            days_per_weekday = day_weekdays.value_counts().reindex(range(7), fill_value=0)
+            slot_totals = pd.DataFrame(0, index=range(7), columns=TRAINING_TIMES)
+            membership_mix = pd.Series(dtype='int64')
+            if not daily.empty:
+                weekdays = pd.to_datetime(daily['Dátum'], format='%Y-%m-%d').dt.weekday
+                slot_totals = daily.assign(weekday=weekdays).pivot_table(
+                    index='weekday', columns='Čas tréningu', values='Počet', aggfunc='sum', fill_value=0
+                ).reindex(index=range(7), columns=TRAINING_TIMES, fill_value=0)
+                membership_mix = daily.groupby('Typ členstva')['Počet'].sum().sort_values(ascending=False)
+            
+            self.daily, self.closed_days = daily, days
+            self.last_closed_day = days[-1] if days else ""
+            self._slot_totals, self._days_per_weekday = slot_totals, days_per_weekday
+            self.membership_mix = membership_mix
+            self._version = version
+
+    def _averages(self):
+        averages = self._slot_totals.div(self._days_per_weekday.where(self._days_per_weekday > 0), axis=0)
+        return averages.fillna(0.0)
+
+    def heatmap(self):
+        """Priemerná účasť podľa dňa v týždni (riadky) a času tréningu (stĺpce)."""
+        averages = self._averages()
+        averages.index = WEEKDAY_NAMES
+        return averages
+
+    def _fit(self):
+        """Model odhadu pre aktuálny stav - prepočíta sa len po uzavretí ďalšieho dňa."""
+        model = self._model
+        if model is not None and model['fitted_for'] == self._version:
+            return model
+        
+        averages = self._averages()
+        trend = 1.0
+        if self.last_closed_day:
+            last_day = datetime.strptime(self.last_closed_day, "%Y-%m-%d").date()
+            cutoff = (last_day - timedelta(days=FORECAST_TREND_DAYS - 1)).isoformat()
+            recent = self.daily[self.daily['Dátum'] >= cutoff]
+            recent_days = [day for day in self.closed_days if day >= cutoff]
+            weekdays = pd.to_datetime(pd.Series(recent_days, dtype=object), format='%Y-%m-%d').dt.weekday
+            expected = averages.sum(axis=1).reindex(weekdays).sum()
+            if expected > 0:
+                low, high = FORECAST_TREND_LIMITS
+                trend = min(max(recent['Počet'].sum() / expected, low), high)
+        
+        model = {'fitted_for': self._version, 'averages': averages, 'trend': trend}
+        self._model = model
+        return model
+
+    def forecast(self, day):
+        """Odhadovaný počet prihlásených na deň podľa času tréningu."""
+        model = self._fit()
+        return (model['averages'].loc[day.weekday()] * model['trend']).to_dict()
+
+
+@st.cache_resource
+def get_attendance_aggregates():
+    """Jedna inštancia agregátov pre celý proces."""
+    return AttendanceAggregates(get_visit_log())
+
+
+def render_heatmap(heatmap):
+    """HTML tabuľka heatmapy - farba bunky podľa priemernej účasti."""
+    max_value = heatmap.values.max() if heatmap.size else 0
+    header = "".join(f"<th style='padding: 6px;'>{slot}</th>" for slot in heatmap.columns)
+    rows = []
+    for weekday, values in heatmap.iterrows():
+        cells = []
+        for value in values:
+            alpha = value / max_value if max_value else 0
+            cells.append(
+                f"<td style='padding: 6px; text-align: center; "
+                f"background-color: rgba(255, 75, 75, {alpha:.2f});'>{value:.1f}</td>"
+            )
+        rows.append(f"<tr><th style='padding: 6px; text-align: left;'>{weekday}</th>{''.join(cells)}</tr>")
+    return f"""
+    <table style="width: 100%; border-collapse: collapse; margin: 10px 0;">
+        <tr><th></th>{header}</tr>
+        {''.join(rows)}
+    </table>
+    """
+
+
+def leaderboard_section(client, spreadsheet_id):
+    """Sekcia štatistík - rebríček zo zdieľaného stavu (mesiac, čas tréningu, celkovo)."""
+    leaderboard = get_leaderboard()
+    
+    st.markdown("### 🏆 Rebríček")
+    scopes = {f"month:{date.today().strftime('%Y-%m')}": "Tento mesiac", "all": "Celkovo"}
+    scopes.update({f"slot:{training_time}": f"Tréning {training_time}" for training_time in TRAINING_TIMES})
+    scope = st.selectbox(
+        "Rebríček",
+        options=list(scopes),
+        format_func=scopes.get,
+        label_visibility="collapsed",
+        key="leaderboard_scope"
+    )
+    
+    top = leaderboard.top(scope, 10)
+    if not get_visit_log().is_ready():
+        st.info("⏳ História sa ešte načítava, rebríček zatiaľ nie je úplný.")
+    if top:
+        st.dataframe(
+            pd.DataFrame(top, columns=['Meno', 'Tréningy'], index=range(1, len(top) + 1)),
+            use_container_width=True
+        )
+    else:
+        st.info("Zatiaľ žiadne tréningy.")
+    
+    # Po importe alebo čistení histórie - nanovo sa načítajú všetky uzavreté dni
+    if st.button("♻️ Prepočítať z histórie", key="leaderboard_rebuild"):
+        with st.spinner("Načítavam históriu..."):
+            get_closed_day_feed(spreadsheet_id).rebuild(client)
+        st.rerun()
+    
+    st.markdown("---")
+
+
+def attendance_heatmap_section(client, spreadsheet_id):
+    """Sekcia štatistík - priemerná účasť podľa dňa a času, mix členstiev."""
+    aggregates = get_attendance_aggregates()
+    with st.spinner("Aktualizujem prehľad vyťaženosti..."):
+        get_closed_day_feed(spreadsheet_id).update(client)
+        aggregates.sync()
+    
+    st.markdown("### 🔥 Priemerná účasť podľa dňa a času")
+    if aggregates.membership_mix.empty:
+        st.info("Zatiaľ nie sú uzavreté žiadne dni s účasťou.")
+        return
+    
+    st.markdown(render_heatmap(aggregates.heatmap()), unsafe_allow_html=True)
+    
+    st.markdown("### 🧩 Mix typov členstva")
+    total = aggregates.membership_mix.sum()
+    cols = st.columns(max(1, min(4, len(aggregates.membership_mix))))
+    for i, (membership, cnt) in enumerate(aggregates.membership_mix.items()):
+        with cols[i % 4]:
+            st.metric(membership, f"{cnt / total:.0%}", delta=f"{int(cnt)} vstupov", delta_color="off")
+    
+    st.markdown("---")
+
+
+def member_keys(names):
+    """Normalizované mená pre celý stĺpec - normalize_name sa volá len raz na unikátne meno."""
+    codes, uniques = pd.factorize(names.astype(str))
+    normalized = pd.Index(uniques, dtype=object).map(normalize_name)
+    return pd.Series(normalized.take(codes), index=names.index, dtype=object)
+
+
+def month_number(months):
+    """YYYY-MM → poradové číslo mesiaca (rok * 12 + mesiac) pre rozdiely mesiacov."""
+    return months.str[:4].astype(int) * 12 + months.str[5:7].astype(int)
+
+
+class MemberActivity:
+    """
+    Tréningy členov po mesiacoch - základ pre kohorty a retenciu.
+    
+    Pre každého člena a mesiac sa drží počet tréningov a posledný tréning -
+    jeden GROUP BY nad tréningami uzavretých dní vo VisitLog, len keď
+    ClosedDayFeed zapíše ďalšie dni. Matica retencie sa mení len
+    s uzavretím mesiaca, preto sa počíta raz na mesiac.
+    """
+
+    COLUMNS = ['Kľúč', 'Meno', 'Mesiac', 'Tréningy', 'Posledný']
+
+    def __init__(self, visits):
+        self.visits = visits
+        self._lock = threading.Lock()
+        self._version = None
+        self._retention = {}
+        self.last_closed_day = ""
+        self.months = pd.DataFrame(columns=self.COLUMNS)
+
+    def sync(self):
+        """Nové načítanie tabuľky člen × mesiac, ak pribudli uzavreté dni."""
+        version = self.visits.closed_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            self.months = self.visits.member_months()
+            self.last_closed_day = self.visits.last_closed_day()
+            self._retention = {}
+            self._version = version
+
+    def retention(self, closed_month):
+        """
+        Matica kohort - riadok je mesiac prvého tréningu, stĺpec počet
+        mesiacov od neho. Hodnoty sú podiel členov kohorty, ktorí v danom
+        mesiaci trénovali; neuzavreté mesiace sú prázdne.
+        """
+        if closed_month in self._retention:
+            return self._retention[closed_month]
+        
+        months = self.months
+        columns = list(range(RETENTION_MONTHS + 1))
+        if months.empty:
+            return pd.DataFrame(columns=columns)
+        number = month_number(months['Mesiac'])
+        first = number.groupby(months['Kľúč']).transform('min')
+        offset = number - first
+        closed = month_number(pd.Series([closed_month])).iloc[0]
+        active = months[(offset <= RETENTION_MONTHS) & (first <= closed)].assign(
+            Kohorta=months['Mesiac'].groupby(months['Kľúč']).transform('min'), Odstup=offset
+        )
+        counts = active.pivot_table(
+            index='Kohorta', columns='Odstup', values='Kľúč', aggfunc='count', fill_value=0
+        ).reindex(columns=columns, fill_value=0)
+        
+        matrix = counts.div(counts[0], axis=0)
+        cohort_numbers = month_number(counts.index.to_series())
+        for column in columns:
+            matrix.loc[(cohort_numbers + column > closed).values, column] = float('nan')
+        matrix.insert(0, 'Noví', counts[0])
+        self._retention = {closed_month: matrix}
+        return matrix
+
+    def at_risk(self, today=None, present=()):
+        """
+        Členovia, ktorí netrénovali viac ako CHURN_DAYS dní (podľa uzavretých
+        dní) - len tí, čo trénovali za posledných CHURN_WINDOW_DAYS dní.
+        Členovia v present (kľúče dnes prihlásených) sa vynechajú.
+        """
+        today = today or date.today()
+        cutoff = (today - timedelta(days=CHURN_WINDOW_DAYS)).isoformat()
+        recent = self.months[(self.months['Posledný'] >= cutoff) & ~self.months['Kľúč'].isin(list(present))]
+        if recent.empty:
+            return pd.DataFrame(columns=['Meno', 'Posledný tréning', 'Dní bez tréningu'])
+        latest = recent.sort_values('Posledný').groupby('Kľúč').tail(1)
+        days_absent = (pd.Timestamp(today) - pd.to_datetime(latest['Posledný'], format='%Y-%m-%d')).dt.days
+        result = pd.DataFrame({
+            'Meno': latest['Meno'],
+            'Posledný tréning': latest['Posledný'],
+            'Dní bez tréningu': days_absent
+        })
+        return result[result['Dní bez tréningu'] > CHURN_DAYS].sort_values('Dní bez tréningu').reset_index(drop=True)
+
+
+@st.cache_resource
+def get_member_activity():
+    """Jedna inštancia mesačnej aktivity členov pre celý proces."""
+    return MemberActivity(get_visit_log())
+
+
+def retention_section(client, spreadsheet_id):
+    """Sekcia štatistík - retencia kohort a členovia ohrození odchodom."""
+    activity = get_member_activity()
+    with st.spinner("Aktualizujem retenciu..."):
+        get_closed_day_feed(spreadsheet_id).update(client)
+        activity.sync()
+    
+    st.markdown("### 📉 Retencia podľa mesiaca prvého tréningu")
+    closed_month = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    retention = activity.retention(closed_month)
+    if retention.empty:
+        st.info("Zatiaľ nie je uzavretý žiadny mesiac s tréningami.")
+    else:
+        table = retention.copy()
+        table.index = [format_month(month) for month in table.index]
+        for column in range(1, RETENTION_MONTHS + 1):
+            table[column] = table[column].map(lambda value: "" if pd.isna(value) else f"{value:.0%}")
+        table.columns = ['Noví'] + [f"+{column} mes." for column in range(1, RETENTION_MONTHS + 1)]
+        st.dataframe(table.iloc[::-1], use_container_width=True)
+    
+    # Kto sa dnes prihlásil (ktorákoľvek pobočka), už ohrozený nie je
+    at_risk = activity.at_risk(present=get_visit_log().members_on(date.today()))
+    st.markdown(f"### ⚠️ Bez tréningu viac ako {CHURN_DAYS} dní ({len(at_risk)})")
+    if at_risk.empty:
+        st.info("Nikto nechýba dlhšie ako 3 týždne.")
+    else:
+        st.dataframe(at_risk, use_container_width=True, hide_index=True)
+    st.caption(
+        f"Podľa uzavretých dní (do {activity.last_closed_day or '-'}), "
+        f"len členovia s tréningom za posledných {CHURN_WINDOW_DAYS} dní."
+    )
+    
+    st.markdown("---")
+
+
+@st.cache_data
+def load_report_summary(path, mtime):
+    """Súhrn mesačného reportu z JSON (mtime v kľúči cache - po novom behu cronu sa načíta znova)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def monthly_report_section():
+    """Sekcia štatistík - predpočítané mesačné reporty (bez čítania hárkov)."""
+    if not os.path.isdir(REPORTS_DIR):
+        return
+    paths = sorted(
+        (os.path.join(REPORTS_DIR, name) for name in os.listdir(REPORTS_DIR) if name.endswith(".json")),
+        reverse=True
+    )
+    if not paths:
+        return
+    
+    st.markdown("### 📑 Mesačný report")
+    months = [os.path.basename(path)[:-len(".json")] for path in paths]
+    month = st.selectbox("Mesiac", months, format_func=format_month, key="report_month")
+    path = paths[months.index(month)]
+    try:
+        summary = load_report_summary(path, os.path.getmtime(path))
+    except (OSError, ValueError) as e:
+        st.error(f"❌ Report sa nepodarilo načítať: {e}")
+        return
+    
+    if not summary.get("complete", True):
+        st.warning(f"⚠️ Neúplný mesiac - uzavreté dni len do {summary.get('closed_through') or '-'}.")
+    
+    cols = st.columns(4)
+    cols[0].metric("Tréningy", summary["total"])
+    cols[1].metric("Priemer na deň", summary["avg_per_day"])
+    cols[2].metric("Členovia", summary["members"])
+    cols[3].metric("Noví členovia", summary["new_members"])
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Vyťaženosť časov tréningov**")
+        slots = pd.DataFrame([
+            {
+                'Čas': slot,
+                'Spolu': data["total"],
+                'Priemer na deň': data["avg_per_day"],
+                'Vyťaženosť': f"{data['utilization']:.0%}" if data["utilization"] is not None else "-"
+            }
+            for slot, data in summary["slots"].items()
+        ])
+        st.dataframe(slots, use_container_width=True, hide_index=True)
+        st.markdown("**Typy členstva**")
+        mix = pd.DataFrame(list(summary["membership_mix"].items()), columns=['Typ členstva', 'Vstupy'])
+        st.dataframe(mix, use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown("**Najaktívnejší členovia**")
+        top = pd.DataFrame(summary["top_members"], columns=['Meno', 'Tréningy'])
+        top.index = range(1, len(top) + 1)
+        st.dataframe(top, use_container_width=True)
+    
+    downloads = st.columns(2)
+    for column, (kind, mime) in zip(downloads, [("html", "text/html"), ("csv", "text/csv")]):
+        file_path = os.path.join(REPORTS_DIR, summary["files"][kind])
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                column.download_button(
+                    label=f"📥 Report (.{kind})",
+                    data=f.read(),
+                    file_name=f"giantgym_{month}.{kind}",
+                    mime=mime,
+                    use_container_width=True
+                )
+    st.caption(f"Vygenerované {summary['generated_at']} (monthly_report.py).")
+    
+    st.markdown("---")
+
+
+def normalize_sheet_row(row):
+    """Riadok hárku doplnený/orezaný na šírku SHEET_HEADER (hárky majú jednotnú schému)."""
+    return (list(row) + [""] * len(SHEET_HEADER))[:len(SHEET_HEADER)]
+
+
+def iter_attendance_rows(client, spreadsheet_id, start, end):
+    """
+    Generátor riadkov účasti za obdobie [start, end].
+    
+    Načítavajú sa len hárky, ktoré do obdobia patria (zo všetkých pobočiek),
+    súbežne, ale v pamäti je najviac SHARD_READ_WORKERS denných hárkov.
+    """
+    def read_sheet(item):
+        location, worksheet = item
+        return location, worksheet.title, worksheet.get_all_values()
+    
+    sheets = history_sheets_between(client, get_shard_router(spreadsheet_id), get_sheet_catalog(), start, end)
+    for location, title, values in ordered_parallel_map(read_sheet, sheets):
+        for row in values[1:]:
+            if any(cell.strip() for cell in row):
+                yield [title] + normalize_sheet_row(row) + [location]
+
+
+def write_attendance_export(rows, export_format, path):
+    """Zápis riadkov do CSV alebo XLSX súboru priebežne, riadok po riadku."""
+    columns = ['Dátum'] + SHEET_HEADER + ['Pobočka']
+    if export_format == "xlsx":
+        from openpyxl import Workbook
+        
+        # write_only režim drží v pamäti len aktuálny riadok
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Dochádzka")
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+    else:
+        # utf-8-sig, aby Excel správne zobrazil diakritiku
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+
+
+def export_section(client, spreadsheet_id):
+    """Sekcia trénera - export dochádzky za zvolené obdobie."""
+    with st.expander("📤 Export dochádzky"):
+        today = date.today()
+        period = st.date_input(
+            "Obdobie",
+            value=(today.replace(day=1), today),
+            max_value=today,
+            key="export_period"
+        )
+        export_format = st.radio("Formát", options=["csv", "xlsx"], horizontal=True, key="export_format")
+        
+        if st.button("📦 Pripraviť export", use_container_width=True):
+            if not isinstance(period, (list, tuple)) or len(period) != 2:
+                st.warning("⚠️ Prosím, vyber začiatok aj koniec obdobia.")
+                return
+            start, end = period
+            
+            # Súbor sa skladá na disku, nie v pamäti
+            fd, path = tempfile.mkstemp(suffix=f".{export_format}")
+            os.close(fd)
+            try:
+                with st.spinner("Pripravujem export..."):
+                    write_attendance_export(
+                        iter_attendance_rows(client, spreadsheet_id, start, end),
+                        export_format,
+                        path
+                    )
+                mime = ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        if export_format == "xlsx" else "text/csv")
+                with open(path, 'rb') as f:
+                    st.download_button(
+                        label=f"📥 Stiahnuť export (.{export_format})",
+                        data=f,
+                        file_name=f"dochadzka_{day_sheet_title(start)}_{day_sheet_title(end)}.{export_format}",
+                        mime=mime,
+                        use_container_width=True
+                    )
+            except Exception as e:
+                st.error(f"❌ Chyba pri exporte: {e}")
+            finally:
+                os.remove(path)
+
+
+def month_bounds(month):
+    """Prvý a posledný deň mesiaca YYYY-MM."""
+    first = datetime.strptime(month, "%Y-%m").date()
+    next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+def get_month_top_members(leaderboard, month):
+    """
+    Top 3 za mesiac z rebríčka ako zoradený zoznam (meno, počet) - bez čítania
+    histórie. Nie dict podľa mena, aby sa dvaja členovia s rovnakým menom nezlúčili.
+    """
+    return leaderboard.top(f"month:{month}", 3)
 
 
-def get_monthly_statistics(client, spreadsheet_id):
-    """Výpočet štatistík za jednotlivé mesiace - top 3 najaktívnejší členovia."""
+def format_month(month):
+    """Formátovanie mesiaca YYYY-MM na názov (napr. "Október 2026")."""
     try:
-        df = get_all_attendance_data(client, spreadsheet_id)
-        
-        if df.empty:
-            return {}
-        
-        # Konverzia dátumov
-        df['Dátum_parsed'] = pd.to_datetime(df['Dátum'], errors='coerce', format='%Y-%m-%d')
-        df = df.dropna(subset=['Dátum_parsed'])
-        
-        # Pridanie mesiaca a roka
-        df['Mesiac'] = df['Dátum_parsed'].dt.to_period('M')
-        df['Mesiac_str'] = df['Mesiac'].astype(str)
-        
-        # Zoskupenie podľa mesiaca a mena
-        monthly_stats = {}
-        
-        for month in df['Mesiac_str'].unique():
-            month_df = df[df['Mesiac_str'] == month]
-            # Počítanie tréningov pre každého člena
-            member_counts = month_df['Meno'].value_counts()
-            # Top 3 najaktívnejší
-            top_3 = member_counts.head(3).to_dict()
-            monthly_stats[month] = top_3
-        
-        return monthly_stats
-    except Exception as e:
-        st.error(f"Chyba pri výpočte štatistík: {e}")
-        return {}
+        year, month_num = month.split('-')
+        month_names = {
+            '01': 'Január', '02': 'Február', '03': 'Marec',
+            '04': 'Apríl', '05': 'Máj', '06': 'Jún',
+            '07': 'Júl', '08': 'August', '09': 'September',
+            '10': 'Október', '11': 'November', '12': 'December'
+        }
+        month_name = month_names.get(month_num, month_num)
+        return f"{month_name} {year}"
+    except ValueError:
+        return month
 
 
-def participant_view(worksheet, query_params=None):
+def participant_view(worksheet, client, query_params=None):
     """Pohľad pre účastníka - prihlásenie na tréning."""
     st.title("🥊 Prihlásenie na tréning")
     st.markdown("---")
@@ -262,7 +2907,22 @@ def participant_view(worksheet, query_params=None):
     url_name = unquote(query_params.get("name", ""))
     url_membership = unquote(query_params.get("membership", ""))
     url_time = unquote(query_params.get("time", ""))
-    auto_submit = query_params.get("auto", "0") == "1"
+    # Platné auto=1 vybaví už main() (auto_checkin_view) - sem príde len s neúplnými
+    # údajmi a formulár ich predvyplní. S nastaveným kľúčom členských kódov sa
+    # meno z URL nikdy neodošle samo (treba kód alebo formulár).
+    auto_submit = query_params.get("auto", "0") == "1" and not get_member_token_key()
+    
+    # Členský kód (?m=...) - údaje sa berú zo zoznamu členov, nie z URL
+    member_token = query_params.get("m", "")
+    if member_token:
+        member = resolve_member_token(client, get_spreadsheet_id(), member_token)
+        if member is None:
+            st.error("⚠️ Neplatný alebo neznámy členský kód.")
+            url_name = url_membership = url_time = ""
+            auto_submit = False
+        else:
+            url_name, url_membership, url_time = member['name'], member['membership'], member['time']
+            auto_submit = query_params.get("auto", "1") == "1"
     
     # Určenie predvolených hodnôt z URL parametrov
     default_name = url_name if url_name else ""
@@ -292,9 +2952,12 @@ def participant_view(worksheet, query_params=None):
                 default_time_index = i
                 break
     
-    # Automatické odoslanie ak sú všetky údaje v URL a auto=1
-    auto_submit_ready = (auto_submit and url_name and url_membership and url_time and 
-                        url_membership in MEMBERSHIP_TYPES and url_time in TRAINING_TIMES)
+    # Obsadenosť tréningov z pamäte (počítadlá sa naplnia raz za deň)
+    try:
+        ensure_counters_seeded(worksheet)
+    except Exception:
+        # Formulár funguje aj bez obsadenosti, prihlásenie skúsi hárok načítať znova
+        logger.warning("Počítadlá sa nepodarilo naplniť", exc_info=True)
     
     # Formulár na prihlásenie
     with st.form("attendance_form", clear_on_submit=True):
@@ -316,6 +2979,7 @@ def participant_view(worksheet, query_params=None):
             "Čas tréningu *",
             options=TRAINING_TIMES,
             index=default_time_index,
+            format_func=lambda t: format_slot_option(counter_day(worksheet), t),
             key="time_select"
         )
         
@@ -350,30 +3014,6 @@ def participant_view(worksheet, query_params=None):
             type="primary"
         )
         
-        # Automatické odoslanie ak sú všetky údaje v URL
-        if auto_submit_ready and not submitted:
-            # Použijeme údaje z URL
-            final_name = url_name.strip()
-            final_membership = url_membership
-            final_time = url_time
-            
-            # Kontrola honeypot (musí byť prázdny)
-            if not honeypot or not honeypot.strip():
-                # Automatické odoslanie
-                if add_attendance(worksheet, final_name, final_membership, final_time):
-                    st.success("🎉 Úspešne prihlásený/á!")
-                    st.balloons()
-                    
-                    # Po úspešnom odoslaní presmeruj na čistú stránku (bez parametrov)
-                    st.markdown("""
-                    <script>
-                    setTimeout(function() {
-                        window.location.href = 'https://giantgym.streamlit.app/?view=participant';
-                    }, 2000);
-                    </script>
-                    """, unsafe_allow_html=True)
-                    return
-        
         if submitted:
             # Kontrola honeypot poľa - ak je vyplnené, ide o bota
             if honeypot and honeypot.strip():
@@ -384,9 +3024,14 @@ def participant_view(worksheet, query_params=None):
                 st.warning("⚠️ Prosím, vyber typ členstva.")
             elif not training_time:
                 st.warning("⚠️ Prosím, vyber čas tréningu.")
+            elif not allow_checkin_attempt(name.strip()):
+                st.error("⚠️ Príliš veľa pokusov o prihlásenie. Skús to znova neskôr.")
             else:
-                if add_attendance(worksheet, name.strip(), membership, training_time):
+                if check_in(worksheet, client, name.strip(), membership, training_time):
                     st.success("🎉 Úspešne prihlásený/á!")
+                    show_member_rank(worksheet, name.strip())
+                    if member_token and url_name and get_visit_log().is_ready():
+                        st.markdown(f"[📅 Moje tréningy]({member_history_url(member_token)})")
                     st.balloons()
                     
                     # Ak bolo odoslanie cez URL parametre, presmeruj
@@ -400,49 +3045,245 @@ def participant_view(worksheet, query_params=None):
                         """, unsafe_allow_html=True)
 
 
-def generate_wallet_pass(name, membership, time, auto=True):
+def member_history_view(client, spreadsheet_id, query_params):
+    """Pohľad pre člena - vlastné tréningy, mesačné súčty a séria (z indexu, bez čítania hárkov)."""
+    st.title("📅 Moje tréningy")
+    st.markdown("---")
+    
+    member = resolve_member_token(client, spreadsheet_id, query_params.get("m", ""))
+    if member is None:
+        st.error("⚠️ Neplatný alebo neznámy členský kód.")
+        return
+    
+    # Kým sa história načítava, neúplné súčty a séria by klamali
+    if not get_visit_log().is_ready():
+        st.info("⏳ História tréningov sa ešte načítava. Skús to o chvíľu znova.")
+        return
+    
+    visits = get_member_history().of(member['name'])
+    st.markdown(f"### 👤 {member['name']}")
+    if not visits:
+        st.info("Zatiaľ žiadne tréningy.")
+        return
+    
+    this_month = date.today().strftime("%Y-%m")
+    monthly = pd.Series([day[:7] for day, _ in visits]).value_counts().sort_index(ascending=False)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Tento mesiac", int(monthly.get(this_month, 0)))
+    with col2:
+        st.metric("Celkovo", len(visits))
+    with col3:
+        st.metric("Séria (týždne)", training_streak(visits))
+    
+    st.markdown("### 📊 Po mesiacoch")
+    st.dataframe(
+        pd.DataFrame({'Mesiac': [format_month(month) for month in monthly.index], 'Tréningy': monthly.values}),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    st.markdown("### 🕐 Posledné tréningy")
+    recent = visits[::-1][:30]
+    st.dataframe(
+        pd.DataFrame({
+            'Dátum': [datetime.strptime(day, "%Y-%m-%d").strftime("%d.%m.%Y") for day, _ in recent],
+            'Čas tréningu': [training_time for _, training_time in recent]
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+
+class BlobStore:
     """
-    Generuje .pkpass súbor pre Apple Wallet a Google Wallet.
+    Zdieľané úložisko vygenerovaných súborov (pkpass, QR obrázky).
+    
+    Kľúčom je hash obsahu, takže rovnaký súbor sa uloží len raz. Celková
+    veľkosť je obmedzená (najdlhšie nepoužité položky sa vyhodia ako prvé)
+    a položky po TTL expirujú. V session_state sa drží len kľúč.
     """
-    # Vytvorenie URL
-    base_url = "https://giantgym.streamlit.app/?view=participant"
-    params = {
-        "name": name,
-        "membership": membership,
-        "time": time
-    }
-    if auto:
-        params["auto"] = "1"
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, data, **meta):
+        """Uloženie súboru - vráti kľúč (hash obsahu)."""
+        key = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            self._expire()
+            if key in self._items:
+                self._size -= len(self._items.pop(key)[0])
+            self._items[key] = (data, meta, time_module.monotonic() + self.ttl)
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._items) > 1:
+                _, (evicted, _, _) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+        return key
+
+    def get(self, key):
+        """Súbor a jeho metadáta podľa kľúča, alebo (None, None) ak už nie je k dispozícii."""
+        with self._lock:
+            self._expire()
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None, None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0], item[1]
+
+    def _expire(self):
+        now = time_module.monotonic()
+        for key in [key for key, (_, _, expires) in self._items.items() if expires <= now]:
+            self._size -= len(self._items.pop(key)[0])
+            self.evictions += 1
+
+    def stats(self):
+        """Štatistiky úložiska pre trénera."""
+        with self._lock:
+            self._expire()
+            return {
+                "items": len(self._items),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+@st.cache_resource
+def get_blob_store(name):
+    """Pomenované úložisko súborov zdieľané v procese (limity z BLOB_STORE_LIMITS)."""
+    max_bytes, ttl = BLOB_STORE_LIMITS[name]
+    return BlobStore(max_bytes, ttl)
+
+
+class PassSigner:
+    """
+    Podpisovanie manifest.json pre Apple Wallet (PKCS#7, oddelený podpis).
     
-    query_string = "&".join([f"{k}={quote(str(v))}" for k, v in params.items()])
-    url = f"{base_url}&{query_string}"
+    Certifikát, kľúč a WWDR certifikát sa parsujú raz pri vytvorení,
+    samotný podpis je potom len jedna RSA operácia.
+    """
+
+    def __init__(self, certificate_pem, private_key_pem, wwdr_certificate_pem=None, password=None):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import serialization
+        
+        self.certificate = x509.load_pem_x509_certificate(certificate_pem.encode('utf-8'))
+        self.private_key = serialization.load_pem_private_key(
+            private_key_pem.encode('utf-8'),
+            password=password.encode('utf-8') if password else None
+        )
+        self.wwdr_certificate = (
+            x509.load_pem_x509_certificate(wwdr_certificate_pem.encode('utf-8'))
+            if wwdr_certificate_pem else None
+        )
+
+    def sign(self, manifest_json):
+        """DER podpis manifestu (obsah súboru signature)."""
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.serialization import Encoding, pkcs7
+        
+        builder = (
+            pkcs7.PKCS7SignatureBuilder()
+            .set_data(manifest_json)
+            .add_signer(self.certificate, self.private_key, hashes.SHA256())
+        )
+        if self.wwdr_certificate is not None:
+            builder = builder.add_certificate(self.wwdr_certificate)
+        return builder.sign(Encoding.DER, [pkcs7.PKCS7Options.DetachedSignature, pkcs7.PKCS7Options.Binary])
+
+
+@st.cache_resource
+def get_pass_signer():
+    """Podpisovač z secrets ([wallet_pass]) - načítaný raz za proces, None ak chýba konfigurácia."""
+    try:
+        config = st.secrets["wallet_pass"]
+        return PassSigner(
+            config["certificate"],
+            config["private_key"],
+            config.get("wwdr_certificate"),
+            config.get("private_key_password")
+        )
+    except KeyError:
+        return None
+    except Exception as e:
+        logger.error("Nepodarilo sa načítať certifikát pre Wallet Pass: %s", e)
+        return None
+
+
+def wallet_pass_setting(key, default):
+    """Nastavenie passu zo secrets ([wallet_pass]) s predvolenou hodnotou."""
+    try:
+        return st.secrets["wallet_pass"].get(key, default)
+    except Exception:
+        return default
+
+
+@st.cache_resource
+def get_pass_template():
+    """
+    Statické súbory passu (ikona, logo, strip) a ich SHA1 - raz za proces.
     
-    # Generovanie QR kódu
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(url)
-    qr.make(fit=True)
+    Súbory sa berú z WALLET_ASSETS_DIR; icon.png je pre Apple Wallet
+    povinná, preto sa pri jej absencii vygeneruje jednofarebná.
+    """
+    files = {}
+    for filename in WALLET_ASSET_FILES:
+        path = os.path.join(WALLET_ASSETS_DIR, filename)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                files[filename] = f.read()
     
-    img = qr.make_image(fill_color="black", back_color="white")
+    if "icon.png" not in files:
+        from PIL import Image
+        
+        icon_buffer = io.BytesIO()
+        Image.new("RGB", (58, 58), (0, 0, 0)).save(icon_buffer, format='PNG')
+        files["icon.png"] = icon_buffer.getvalue()
     
-    # Uloženie QR kódu do bufferu
-    qr_buffer = io.BytesIO()
-    img.save(qr_buffer, format='PNG')
-    qr_buffer.seek(0)
+    hashes = {filename: hashlib.sha1(data).hexdigest() for filename, data in files.items()}
+    return files, hashes
+
+
+def generate_wallet_pass(name, membership, time, url):
+    """
+    Generuje .pkpass súbor pre Apple Wallet a Google Wallet.
     
-    # JSON pre pass.json (bez podpisu - pre testovanie)
-    # Poznámka: Apple Wallet môže vyžadovať digitálny podpis pre automatické otvorenie
+    Per člena sa vytvára len pass.json, manifest a podpis - statické
+    súbory a kľúče sú načítané raz za proces.
+    """
+    # QR kód vykreslí Wallet sám z poľa barcodes, obrázok netreba generovať
+    barcode = {
+        "message": url,
+        "format": "PKBarcodeFormatQR",
+        "messageEncoding": "iso-8859-1",
+        "altText": "Naskenuj pre prihlásenie"
+    }
     pass_data = {
         "formatVersion": 1,
-        "passTypeIdentifier": "pass.com.giantgym.attendance",
+        "passTypeIdentifier": wallet_pass_setting("pass_type_identifier", "pass.com.giantgym.attendance"),
         "serialNumber": f"{name.replace(' ', '_')}_{int(datetime.now().timestamp())}",
-        "teamIdentifier": "GIANTGYM",
+        "teamIdentifier": wallet_pass_setting("team_identifier", "GIANTGYM"),
         "organizationName": "Giant Gym",
         "description": "Gym Attendance Pass",
         "logoText": "Giant Gym",
         "foregroundColor": "rgb(255, 255, 255)",
         "backgroundColor": "rgb(0, 0, 0)",
-        "webServiceURL": "https://giantgym.streamlit.app",
-        "authenticationToken": "",
+        "barcode": barcode,
+        "barcodes": [barcode],
         "generic": {
             "primaryFields": [
                 {
@@ -469,51 +3310,36 @@ def generate_wallet_pass(name, membership, time, auto=True):
                     "label": "Vytvorené",
                     "value": datetime.now().strftime("%d.%m.%Y")
                 }
-            ],
-            "barcode": {
-                "message": url,
-                "format": "PKBarcodeFormatQR",
-                "messageEncoding": "iso-8859-1",
-                "altText": "Naskenuj pre prihlásenie"
-            }
+            ]
         }
     }
     
-    # Vytvorenie obsahu súborov
+    template_files, template_hashes = get_pass_template()
     pass_json = json.dumps(pass_data, ensure_ascii=False, indent=2).encode('utf-8')
-    barcode_png = qr_buffer.getvalue()
     
     # Vytvorenie manifest.json (SHA1 hashe všetkých súborov)
-    manifest = {
-        "pass.json": hashlib.sha1(pass_json).hexdigest(),
-        "barcode.png": hashlib.sha1(barcode_png).hexdigest()
-    }
+    manifest = dict(template_hashes)
+    manifest["pass.json"] = hashlib.sha1(pass_json).hexdigest()
     manifest_json = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
     
-    # Vytvorenie prázdneho signature súboru
-    # Poznámka: Pre produkčné použitie by toto malo byť digitálne podpísané Apple Developer certifikátom
-    signature = b""  # Prázdny signature (Apple Wallet môže odmietnuť, ale súbor bude správne formátovaný)
+    # Bez certifikátu v secrets zostane podpis prázdny (Apple Wallet pass odmietne)
+    signer = get_pass_signer()
+    signature = signer.sign(manifest_json) if signer else b""
     
-    # Vytvorenie ZIP archívu (.pkpass)
+    # Vytvorenie ZIP archívu (.pkpass) - PNG sú už skomprimované, ukladáme ich bez kompresie
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # pass.json
         zip_file.writestr("pass.json", pass_json)
-        
-        # QR kód ako obrázok
-        zip_file.writestr("barcode.png", barcode_png)
-        
-        # manifest.json (vyžaduje Apple Wallet)
+        for filename, data in template_files.items():
+            zip_file.writestr(filename, data, compress_type=zipfile.ZIP_STORED)
         zip_file.writestr("manifest.json", manifest_json)
-        
-        # signature (vyžaduje Apple Wallet - prázdny, lebo nemáme Apple Developer certifikát)
         zip_file.writestr("signature", signature)
     
     zip_buffer.seek(0)
     return zip_buffer
 
 
-def wallet_pass_view():
+def wallet_pass_view(client, spreadsheet_id):
     """Pohľad pre generovanie Wallet Pass."""
     st.title("📱 Generovanie Wallet Pass")
     st.markdown("---")
@@ -556,12 +3382,14 @@ def wallet_pass_view():
             if submitted:
                 if name and membership and time:
                     try:
-                        pass_file = generate_wallet_pass(name.strip(), membership, time, auto)
+                        url = member_checkin_url(client, spreadsheet_id, name.strip(), membership, time, auto)
+                        pass_file = generate_wallet_pass(name.strip(), membership, time, url)
                         
                         # Uloženie do session state (mimo formulára)
-                        st.session_state['wallet_pass_data'] = pass_file.getvalue()
-                        st.session_state['wallet_pass_filename'] = f"giantgym_{name.strip().replace(' ', '_')}.pkpass"
-                        st.session_state['wallet_pass_generated'] = True
+                        st.session_state['wallet_pass_key'] = get_blob_store("passes").put(
+                            pass_file.getvalue(),
+                            filename=f"giantgym_{name.strip().replace(' ', '_')}.pkpass"
+                        )
                         st.rerun()
                     except Exception as e:
                         st.error(f"❌ Chyba pri generovaní: {e}")
@@ -569,80 +3397,38 @@ def wallet_pass_view():
                     st.warning("⚠️ Prosím, vyplň všetky polia.")
         
         # Download button mimo formulára (ale vnútri tab1)
-        if st.session_state.get('wallet_pass_generated', False):
+        # Súbor je v zdieľanom úložisku, v session je len kľúč
+        pass_data, pass_meta = None, None
+        if 'wallet_pass_key' in st.session_state:
+            pass_data, pass_meta = get_blob_store("passes").get(st.session_state['wallet_pass_key'])
+            if pass_data is None:
+                del st.session_state['wallet_pass_key']
+                st.info("⌛ Platnosť vygenerovaného súboru vypršala, vygeneruj ho znova.")
+        
+        if pass_data is not None:
             st.markdown("---")
             st.success("✅ Wallet Pass pripravený!")
             
-            # Konverzia binárnych dát na base64 pre JavaScript
-            pass_data_b64 = base64.b64encode(st.session_state['wallet_pass_data']).decode('utf-8')
-            filename = st.session_state['wallet_pass_filename']
-            
-            # JavaScript funkcia pre stiahnutie v Safari
-            download_js = f"""
-            <script>
-            function downloadPkpass() {{
-                // Konverzia base64 na blob
-                const byteCharacters = atob('{pass_data_b64}');
-                const byteNumbers = new Array(byteCharacters.length);
-                for (let i = 0; i < byteCharacters.length; i++) {{
-                    byteNumbers[i] = byteCharacters.charCodeAt(i);
-                }}
-                const byteArray = new Uint8Array(byteNumbers);
-                const blob = new Blob([byteArray], {{ type: 'application/vnd.apple.pkpass' }});
-                
-                // Vytvorenie URL pre blob
-                const url = window.URL.createObjectURL(blob);
-                
-                // Vytvorenie linku a automatické kliknutie
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = '{filename}';
-                a.style.display = 'none';
-                document.body.appendChild(a);
-                a.click();
-                
-                // Vyčistenie
-                setTimeout(() => {{
-                    document.body.removeChild(a);
-                    window.URL.revokeObjectURL(url);
-                }}, 100);
-            }}
-            </script>
-            """
-            st.markdown(download_js, unsafe_allow_html=True)
-            
-            # Tlačidlo, ktoré volá JavaScript funkciu
-            st.markdown(f"""
-            <button onclick="downloadPkpass()" style="
-                width: 100%;
-                padding: 0.5rem 1rem;
-                background-color: #FF4B4B;
-                color: white;
-                border: none;
-                border-radius: 0.5rem;
-                font-size: 1rem;
-                font-weight: 600;
-                cursor: pointer;
-                margin: 10px 0;
-            ">📥 Stiahnuť .pkpass súbor</button>
-            """, unsafe_allow_html=True)
-            
-            # Záložné riešenie pre Streamlit download button
+            # Obsah sa do prehliadača posiela až pri kliknutí na stiahnutie
             st.download_button(
-                label="📥 Stiahnuť .pkpass súbor (záložné)",
-                data=st.session_state['wallet_pass_data'],
-                file_name=st.session_state['wallet_pass_filename'],
+                label="📥 Stiahnuť .pkpass súbor",
+                data=pass_data,
+                file_name=pass_meta['filename'],
                 mime="application/vnd.apple.pkpass",
                 use_container_width=True,
-                key="pkpass_download_fallback"
+                type="primary",
+                key="pkpass_download"
             )
             
             st.markdown("---")
             st.markdown("### 📖 Ako pridať do Wallet:")
+            if get_pass_signer() is None:
+                st.warning(
+                    "⚠️ **Dôležité:** Certifikát pre Wallet Pass nie je nastavený, súbor nie je podpísaný "
+                    "a Apple Wallet ho neotvorí. Pre jednoduchšie použitie odporúčame použiť "
+                    "**QR Kód Obrázok** (druhý tab)."
+                )
             st.markdown("""
-            **⚠️ Dôležité:** Bez Apple Developer certifikátu sa `.pkpass` súbor nemusí automaticky otvoriť v Apple Wallet.
-            Pre jednoduchšie použitie odporúčame použiť **QR Kód Obrázok** (druhý tab).
-            
             **iPhone/iPad - Pokus o otvorenie .pkpass:**
             1. Stiahni súbor v Safari (nie v Chrome)
             2. Otvor stiahnutý súbor v Safari alebo Files app
@@ -703,18 +3489,8 @@ def wallet_pass_view():
             if qr_submitted:
                 if qr_name and qr_membership and qr_time:
                     try:
-                        # Vytvorenie URL
-                        base_url = "https://giantgym.streamlit.app/?view=participant"
-                        params = {
-                            "name": qr_name,
-                            "membership": qr_membership,
-                            "time": qr_time
-                        }
-                        if qr_auto:
-                            params["auto"] = "1"
-                        
-                        query_string = "&".join([f"{k}={quote(str(v))}" for k, v in params.items()])
-                        url = f"{base_url}&{query_string}"
+                        # Vytvorenie URL (členský kód, ak je člen v zozname)
+                        url = member_checkin_url(client, spreadsheet_id, qr_name.strip(), qr_membership, qr_time, qr_auto)
                         
                         # Generovanie QR kódu
                         qr = qrcode.QRCode(version=1, box_size=10, border=5)
@@ -729,10 +3505,11 @@ def wallet_pass_view():
                         qr_img_buffer.seek(0)
                         
                         # Uloženie do session state
-                        st.session_state['qr_code_data'] = qr_img_buffer.getvalue()
-                        st.session_state['qr_code_filename'] = f"giantgym_{qr_name.strip().replace(' ', '_')}.png"
-                        st.session_state['qr_code_url'] = url  # Uloženie URL pre zobrazenie
-                        st.session_state['qr_code_generated'] = True
+                        st.session_state['qr_code_key'] = get_blob_store("qr").put(
+                            qr_img_buffer.getvalue(),
+                            filename=f"giantgym_{qr_name.strip().replace(' ', '_')}.png",
+                            url=url  # URL pre zobrazenie
+                        )
                         st.rerun()
                     except Exception as e:
                         st.error(f"❌ Chyba pri generovaní: {e}")
@@ -740,28 +3517,34 @@ def wallet_pass_view():
                     st.warning("⚠️ Prosím, vyplň všetky polia.")
         
         # Download QR kódu mimo formulára
-        if st.session_state.get('qr_code_generated', False):
+        qr_data, qr_meta = None, None
+        if 'qr_code_key' in st.session_state:
+            qr_data, qr_meta = get_blob_store("qr").get(st.session_state['qr_code_key'])
+            if qr_data is None:
+                del st.session_state['qr_code_key']
+                st.info("⌛ Platnosť vygenerovaného QR kódu vypršala, vygeneruj ho znova.")
+        
+        if qr_data is not None:
             st.markdown("---")
             st.success("✅ QR kód pripravený!")
             
             # Zobrazenie QR kódu
-            st.image(st.session_state['qr_code_data'], caption="Tvoj QR kód", width=300)
+            st.image(qr_data, caption="Tvoj QR kód", width=300)
             
             # Zobrazenie URL na skopírovanie
-            if 'qr_code_url' in st.session_state:
-                st.markdown("### 🔗 URL adresa:")
-                st.text_input(
-                    "Klikni a skopíruj URL",
-                    value=st.session_state['qr_code_url'],
-                    key="qr_url_display",
-                    help="Klikni do poľa a stlač Ctrl+C (Cmd+C na Mac) alebo vyber text a skopíruj",
-                    label_visibility="visible"
-                )
+            st.markdown("### 🔗 URL adresa:")
+            st.text_input(
+                "Klikni a skopíruj URL",
+                value=qr_meta['url'],
+                key="qr_url_display",
+                help="Klikni do poľa a stlač Ctrl+C (Cmd+C na Mac) alebo vyber text a skopíruj",
+                label_visibility="visible"
+            )
             
             st.download_button(
                 label="📥 Stiahnuť QR kód (.png)",
-                data=st.session_state['qr_code_data'],
-                file_name=st.session_state['qr_code_filename'],
+                data=qr_data,
+                file_name=qr_meta['filename'],
                 mime="image/png",
                 use_container_width=True
             )
@@ -837,49 +3620,334 @@ def statistics_view(client, spreadsheet_id):
             st.session_state.trainer_authenticated = False
             st.rerun()
     
-    # Načítanie štatistík
-    with st.spinner("Načítavam štatistiky..."):
-        monthly_stats = get_monthly_statistics(client, spreadsheet_id)
+    monthly_report_section()
+    attendance_heatmap_section(client, spreadsheet_id)
+    retention_section(client, spreadsheet_id)
+    leaderboard_section(client, spreadsheet_id)
     
-    if monthly_stats:
-        # Zoradenie mesiacov od najnovšieho
-        sorted_months = sorted(monthly_stats.keys(), reverse=True)
-        
-        for month in sorted_months:
-            stats = monthly_stats[month]
-            if stats:
-                # Formátovanie názvu mesiaca
-                try:
-                    year, month_num = month.split('-')
-                    month_names = {
-                        '01': 'Január', '02': 'Február', '03': 'Marec',
-                        '04': 'Apríl', '05': 'Máj', '06': 'Jún',
-                        '07': 'Júl', '08': 'August', '09': 'September',
-                        '10': 'Október', '11': 'November', '12': 'December'
-                    }
-                    month_name = month_names.get(month_num, month_num)
-                    month_display = f"{month_name} {year}"
-                except:
-                    month_display = month
-                
-                st.markdown(f"### 📅 {month_display}")
-                
-                # Zobrazenie top 3
-                cols = st.columns(3)
-                for i, (name, count) in enumerate(stats.items()):
-                    with cols[i]:
-                        st.metric(
-                            label=f"{i+1}. miesto",
-                            value=name,
-                            delta=f"{count} tréningov"
-                        )
-                
-                st.markdown("---")
-    else:
+    # Mesiace sa berú z indexu hárkov, počítajú sa len tie na aktuálnej strane
+    try:
+        months = history_months(client, spreadsheet_id)
+    except Exception as e:
+        st.error(f"Chyba pri načítaní hárkov: {e}")
+        return
+    if not months:
         st.info("Zatiaľ nie sú dostupné žiadne štatistiky.")
+        return
+    
+    page_count = (len(months) + STATS_MONTHS_PER_PAGE - 1) // STATS_MONTHS_PER_PAGE
+    page = min(st.session_state.get('stats_page', 0), page_count - 1)
+    page_months = months[page * STATS_MONTHS_PER_PAGE:(page + 1) * STATS_MONTHS_PER_PAGE]
+    
+    # Top 3 mesiaca sa berú z rebríčka v SharedStore (udržiava ho ClosedDayFeed),
+    # nie z cache po mesiacoch - strana tak nečíta žiadne hárky
+    leaderboard = get_leaderboard()
+    for month in page_months:
+        stats = get_month_top_members(leaderboard, month)
+        if stats:
+            st.markdown(f"### 📅 {format_month(month)}")
+            
+            # Zobrazenie top 3
+            cols = st.columns(3)
+            for i, (name, count) in enumerate(stats):
+                with cols[i]:
+                    st.metric(
+                        label=f"{i+1}. miesto",
+                        value=name,
+                        delta=f"{count} tréningov"
+                    )
+            
+            st.markdown("---")
+    
+    # Stránkovanie
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        if page > 0 and st.button("⬅️ Novšie", use_container_width=True):
+            st.session_state['stats_page'] = page - 1
+            st.rerun()
+    with col2:
+        st.markdown(
+            f"<div style='text-align: center; padding-top: 8px;'>Strana {page + 1} z {page_count}</div>",
+            unsafe_allow_html=True
+        )
+    with col3:
+        if page < page_count - 1 and st.button("Staršie ➡️", use_container_width=True):
+            st.session_state['stats_page'] = page + 1
+            st.rerun()
+
+
+def metrics_section():
+    """Sekcia trénera - prevádzkové metriky aplikácie."""
+    with st.expander("📈 Metriky aplikácie"):
+        st.markdown("**Ochrana pred zahltením**")
+        for kind, label in [("client", "podľa zariadenia"), ("name", "podľa mena")]:
+            limiter = get_rate_limiter(kind)
+            st.markdown(
+                f"- {label}: limit {limiter.limit} / {limiter.window:.0f} s, "
+                f"odmietnuté {limiter.rejected}, sledované kľúče {limiter.active_keys()}"
+            )
+        
+        st.markdown("**Zahriatie cache**")
+        warmup = get_warmup_status()
+        if warmup.finished_at:
+            st.markdown(
+                f"- stav: {warmup.state} (deň {warmup.day}), trvanie {warmup.duration:.1f} s, "
+                f"dokončené {warmup.finished_at.strftime('%d.%m. %H:%M:%S')}"
+            )
+            st.caption(", ".join(f"{label} {seconds:.2f} s" for label, seconds in warmup.steps.items()))
+            if warmup.error:
+                st.caption(f"Chyba: {warmup.error}")
+        else:
+            st.markdown(f"- stav: {warmup.state}")
+        
+        st.markdown("**Front zápisov do Sheets**")
+        store = get_shared_store()
+        queue = store.queue_stats()
+        holder = store.lease_holder(WRITER_LEASE) or "-"
+        this_process = " (tento proces)" if holder == store.owner else ""
+        st.markdown(
+            f"- čaká na zápis {queue['depth']}, max. pokusov {queue['max_attempts']}, "
+            f"nezapísané {queue['dead']}\n"
+            f"- zapisovateľ: `{holder}`{this_process}"
+        )
+        if queue['last_error']:
+            st.caption(f"Posledná chyba zápisu: {queue['last_error']}")
+        
+        st.markdown("**Úložiská vygenerovaných súborov**")
+        for name in BLOB_STORE_LIMITS:
+            stats = get_blob_store(name).stats()
+            st.markdown(
+                f"- `{name}`: {stats['items']} súborov, "
+                f"{stats['bytes'] / 1024 / 1024:.1f} / {stats['max_bytes'] / 1024 / 1024:.0f} MB, "
+                f"zásahy {stats['hits']}, minutia {stats['misses']}, vyradené {stats['evictions']}"
+            )
+
+
+def list_profiles():
+    """Uložené profily od najnovšieho ako zoznam (cesta k .pstats, metadáta)."""
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(PROFILES_DIR), reverse=True):
+        if filename.endswith(".pstats"):
+            path = os.path.join(PROFILES_DIR, filename)
+            meta = {}
+            meta_path = path[:-len(".pstats")] + ".json"
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            profiles.append((path, meta))
+    return profiles
+
+
+def save_profile(profiler, meta):
+    """Uloženie profilu (.pstats + .json s metadátami) a vymazanie najstarších nad PROFILE_RETENTION."""
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{meta['view']}"
+    path = os.path.join(PROFILES_DIR, name + ".pstats")
+    profiler.dump_stats(path)
+    with open(os.path.join(PROFILES_DIR, name + ".json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    
+    for old_path, _ in list_profiles()[PROFILE_RETENTION:]:
+        for stale in (old_path, old_path[:-len(".pstats")] + ".json"):
+            if os.path.exists(stale):
+                os.remove(stale)
+    return path
+
+
+def profiled_main():
+    """Spustenie main() pod cProfile a uloženie profilu s počtom volaní Sheets a riadkov."""
+    profiler = cProfile.Profile()
+    calls_before = backend_call_count()
+    started = time_module.perf_counter()
+    profiler.enable()
+    try:
+        main()
+    finally:
+        # Uloží sa aj pri st.rerun() / st.stop(), ktoré sú výnimky
+        profiler.disable()
+        duration_ms = (time_module.perf_counter() - started) * 1000
+        counters = get_slot_counters()
+        meta = {
+            "view": st.query_params.get("view", "participant"),
+            "location": st.query_params.get("location", DEFAULT_LOCATION),
+            "duration_ms": round(duration_ms, 1),
+            "backend_calls": backend_call_count() - calls_before,
+            "today_rows": sum(counters.day_total(day) for day in counters.seeded_days()),
+            "created": datetime.now().isoformat(timespec='seconds')
+        }
+        path = save_profile(profiler, meta)
+        st.caption(
+            f"⏱️ Profil uložený: `{os.path.basename(path)}` - {meta['duration_ms']:.0f} ms, "
+            f"{meta['backend_calls']} volaní Sheets"
+        )
+
+
+def profiles_section():
+    """Sekcia trénera - stiahnutie uložených profilov (?profile=1)."""
+    profiles = list_profiles()
+    if not profiles:
+        return
+    with st.expander("⏱️ Profily (?profile=1)"):
+        st.caption("Súbory .pstats sa dajú otvoriť napr. cez `python -m pstats` alebo snakeviz.")
+        for i, (path, meta) in enumerate(profiles):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.markdown(
+                    f"`{meta.get('created', '')}` **{meta.get('view', '')}** - "
+                    f"{meta.get('duration_ms', 0):.0f} ms, {meta.get('backend_calls', 0)} volaní Sheets, "
+                    f"{meta.get('today_rows', 0)} dnešných záznamov"
+                )
+            with col2:
+                with open(path, 'rb') as f:
+                    st.download_button(
+                        "📥 .pstats",
+                        data=f,
+                        file_name=os.path.basename(path),
+                        key=f"profile_download_{i}",
+                        use_container_width=True
+                    )
+
+
+class WarmupStatus:
+    """Stav posledného zahriatia cache - zobrazuje sa v metrikách trénera."""
+
+    def __init__(self):
+        self.state = "čaká"
+        self.day = None
+        self.finished_at = None
+        self.duration = None
+        self.steps = {}
+        self.error = None
+
+
+class WarmupServices:
+    """
+    Singletony procesu pre zahrievanie - získajú sa v skripte (start_warmup),
+    vlákno na pozadí potom volá len ich metódy, nie st.cache_* ani st.*.
+    """
+
+    def __init__(self, client, spreadsheet_id):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+        self.store = get_shared_store()
+        self.router = get_shard_router(spreadsheet_id)
+        self.catalog = get_sheet_catalog()
+        self.counters = get_slot_counters()
+        self.snapshot = get_today_snapshot()
+        self.feed = get_closed_day_feed(spreadsheet_id)
+        self.aggregates = get_attendance_aggregates()
+        self.activity = get_member_activity()
+        self.roster = get_member_roster(spreadsheet_id)
+
+
+def warm_up(services, day, status, include_history=True):
+    """
+    Príprava cache pre deň - denné hárky všetkých pobočiek, snímok,
+    počítadlá a (voliteľne) agregáty histórie, rebríček a evidencia.
+    
+    Prvý člen pri dverách potom nečaká na otvorenie spreadsheetu ani na
+    prvé čítanie. Chyby sa len zaznamenajú - požiadavky si dáta načítajú samy.
+    """
+    status.state, status.day, status.steps, status.error = "beží", day, {}, None
+    started = time_module.perf_counter()
+    
+    def step(label, func, *args):
+        step_started = time_module.perf_counter()
+        result = func(*args)
+        status.steps[label] = time_module.perf_counter() - step_started
+        return result
+    
+    client, router = services.client, services.router
+    try:
+        for location in router.locations():
+            worksheet = step(
+                f"hárok {location}", services.catalog.day_sheet,
+                client, router.spreadsheet_for(location, day.year), day
+            )
+            step(f"počítadlá {location}", seed_counters, services.counters, services.snapshot, worksheet)
+        if include_history:
+            step("uzavreté dni", services.feed.update, client)
+            step("agregáty", services.aggregates.sync)
+            step("retencia", services.activity.sync)
+            # Evidencia je celá v SharedStore - stačí ju prípadne obnoviť z hárku
+            step("evidencia členstiev", EntitlementLedger(services.store).load, client, services.spreadsheet_id)
+            step("zoznam členov", services.roster.get, client)
+        status.state = "pripravené"
+    except Exception as e:
+        status.state, status.error = "chyba", str(e)
+        logger.exception("Zahrievanie cache zlyhalo (%s)", day)
+    status.duration = time_module.perf_counter() - started
+    status.finished_at = datetime.now()
+
+
+def _warmup_loop(services, status):
+    """Zahriatie pri štarte procesu, potom pred polnocou (zajtrajšok) a po nej (história)."""
+    warm_up(services, date.today(), status)
+    while True:
+        time_module.sleep(seconds_until(WARMUP_BEFORE_ROLLOVER))
+        warm_up(services, date.today() + timedelta(days=1), status, include_history=False)
+        time_module.sleep(seconds_until(WARMUP_AFTER_ROLLOVER))
+        warm_up(services, date.today(), status)
+
+
+@st.cache_resource
+def get_warmup_status():
+    return WarmupStatus()
+
+
+@st.cache_resource
+def start_warmup(_client, spreadsheet_id):
+    """Spustí zahrievanie cache na pozadí - raz za proces."""
+    thread = threading.Thread(
+        target=_warmup_loop,
+        args=(WarmupServices(_client, spreadsheet_id), get_warmup_status()),
+        name="cache-warmup",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+@st.fragment(run_every=DISPLAY_REFRESH_SECONDS)
+def display_view(worksheet, location):
+    """
+    Obrazovka pri vchode - len na čítanie, bez prihlásenia, zo zdieľaného snímku.
+    
+    Ako fragment sa obnovuje sama každých DISPLAY_REFRESH_SECONDS bez
+    prerušenia behu skriptu; čítanie hárku zdieľajú všetky obrazovky cez snímok.
+    """
+    # Po polnoci celá stránka znova - otvorí sa nový denný hárok
+    if worksheet.title != day_sheet_title(date.today()):
+        st.rerun()
+    
+    snapshot = get_today_snapshot()
+    try:
+        df = snapshot.get(worksheet)
+        slot_counts = snapshot.slot_counts(worksheet)
+    except Exception as e:
+        st.error(f"Chyba pri načítaní dát: {e}")
+        return
+    
+    st.markdown(f"""
+    <div style="text-align: center; padding: 30px; background-color: #f0f2f6; border-radius: 15px; margin: 20px 0;">
+        <div class="big-number">{len(df)}</div>
+        <div class="subtitle">prihlásených na dnešný tréning</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    cols = st.columns(len(TRAINING_TIMES))
+    for i, training_time in enumerate(TRAINING_TIMES):
+        count = slot_counts.get(training_time, 0)
+        capacity = get_slot_capacity(training_time)
+        with cols[i]:
+            st.metric(f"🕐 {training_time}", f"{count} / {capacity}" if capacity else count)
+    
+    st.caption(f"📍 {location} · 📅 {date.today().strftime('%d.%m.%Y')} · aktualizované {datetime.now().strftime('%H:%M:%S')}")
 
 
-def trainer_view(worksheet):
+def trainer_view(worksheet, client, spreadsheet_id):
     """Pohľad pre trénera - prehľad účasti."""
     # Kontrola autentifikácie
     if not check_trainer_auth():
@@ -892,18 +3960,31 @@ def trainer_view(worksheet):
     # Tlačidlá na obnovenie a odhlásenie
     col1, col2 = st.columns([3, 1])
     with col1:
-        if st.button("🔄 Obnoviť údaje", use_container_width=True):
-            st.rerun()
+        refresh = st.button("🔄 Obnoviť údaje", use_container_width=True)
     with col2:
         if st.button("🚪 Odhlásiť sa", use_container_width=True):
             st.session_state.trainer_authenticated = False
             st.rerun()
     
-    # Načítanie dát
-    df = get_today_attendance(worksheet)
+    # Načítanie dát zo zdieľaného snímku (obnovenie si vynúti nové čítanie hárku)
+    try:
+        df = get_today_snapshot().get(worksheet, force=refresh)
+    except Exception as e:
+        st.error(f"Chyba pri načítaní dát: {e}")
+        return
+    
+    # Počty z počítadiel - hárok slúži na naplnenie len raz za deň
+    # (alebo pri obnovení, ak niekto upravil hárok ručne)
+    day = counter_day(worksheet)
+    counters = get_slot_counters()
+    if refresh or not counters.is_seeded(day):
+        counters.seed(day, df)
+    
+    # Zoznamy ukazujú aj riadky, ktoré ešte nie sú v hárku - ako počítadlá
+    df = with_pending_rows(df, get_shared_store().pending_rows(worksheet.spreadsheet.id, worksheet.title))
     
     # Zobrazenie počtu
-    count = len(df)
+    count = counters.day_total(day)
     
     st.markdown(f"""
     <div style="text-align: center; padding: 30px; background-color: #f0f2f6; border-radius: 15px; margin: 20px 0;">
@@ -912,30 +3993,56 @@ def trainer_view(worksheet):
     </div>
     """, unsafe_allow_html=True)
     
+    dead_letters_section(client)
+    
+    # Odhad z uzavretých dní vedľa aktuálnych počtov
+    # Uzavreté dni dopĺňa zahrievanie na pozadí, tu sa len prevezmú
+    aggregates = get_attendance_aggregates()
+    aggregates.sync()
+    forecast = aggregates.forecast(date.today())
+    if any(forecast.values()):
+        st.markdown("### 🔮 Odhad na dnes")
+        cols = st.columns(len(TRAINING_TIMES))
+        for i, training_time in enumerate(TRAINING_TIMES):
+            with cols[i]:
+                st.metric(
+                    f"🕐 {training_time}",
+                    counters.slot_total(day, training_time),
+                    delta=f"odhad ~{forecast.get(training_time, 0):.0f}",
+                    delta_color="off"
+                )
+    
     if not df.empty:
         # Prehľad podľa času tréningu
         st.markdown("### ⏰ Prehľad podľa času tréningu")
         
-        # Získanie názvu stĺpca (môže byť "Čas tréningu" alebo "Tréning" pre staré dáta)
-        time_column = 'Čas tréningu' if 'Čas tréningu' in df.columns else 'Tréning'
+        time_column = 'Čas tréningu'
         
         if time_column in df.columns:
-            # Zoskupenie podľa času tréningu
+            # Zoskupenie podľa času tréningu - jeden prechod cez dáta
+            slot_groups = dict(tuple(df.groupby(time_column, observed=True)))
             for training_time in TRAINING_TIMES:
-                time_df = df[df[time_column] == training_time]
-                count = len(time_df)
+                time_df = slot_groups.get(training_time, df.iloc[0:0])
+                count = counters.slot_total(day, training_time)
+                capacity = get_slot_capacity(training_time)
+                capacity_info = f" / {capacity}" if capacity else ""
                 
-                with st.expander(f"🕐 {training_time} - {count} prihlásených", expanded=True):
+                with st.expander(f"🕐 {training_time} - {count}{capacity_info} prihlásených", expanded=True):
                     if not time_df.empty:
                         # Zobrazenie každého účastníka s tlačidlom na vymazanie
                         for idx, row in time_df.iterrows():
                             col1, col2 = st.columns([4, 1])
                             with col1:
-                                st.markdown(f"**{row['Meno']}** - {row['Typ členstva']} ({row['Čas']})")
+                                flag = f" {row['Poznámka']}" if str(row.get('Poznámka', '')).startswith("🚩") else ""
+                                pending = f" _{row['Zápis']}_" if row['Zápis'] else ""
+                                st.markdown(f"**{row['Meno']}** - {row['Typ členstva']} ({row['Čas']}){flag}{pending}")
                             with col2:
+                                if row['Zápis'] == "⚠️ nezapísané":
+                                    st.caption("📮 vyššie")
+                                    continue
                                 delete_key = f"delete_{training_time}_{idx}_{row['Čas']}"
                                 if st.button("🗑️ Vymazať", key=delete_key, use_container_width=True):
-                                    if delete_attendance(worksheet, row['Meno'], row['Čas'], row['Typ členstva'], training_time):
+                                    if remove_attendance(worksheet, client, row['Meno'], row['Čas'], row['Typ členstva'], training_time):
                                         st.success(f"✅ {row['Meno']} bol/a vymazaný/á")
                                         st.rerun()
                                     else:
@@ -945,11 +4052,29 @@ def trainer_view(worksheet):
         
         st.markdown("---")
         
+        # Prihlásenia s vyčerpaným alebo expirovaným členstvom
+        if 'Poznámka' in df.columns:
+            flagged = df[df['Poznámka'].astype(str).str.startswith("🚩")].drop_duplicates('Meno')
+            if not flagged.empty:
+                st.markdown("### 🚩 Členstvá na kontrolu")
+                ledger = get_entitlement_ledger(client, get_spreadsheet_id())
+                for idx, row in flagged.iterrows():
+                    col1, col2 = st.columns([4, 1])
+                    with col1:
+                        st.markdown(f"**{row['Meno']}** - {row['Typ členstva']}: {row['Poznámka']}")
+                    with col2:
+                        if not ledger.status(row['Meno'], row['Typ členstva']):
+                            st.markdown("✅ Obnovené")
+                        elif st.button("🔁 Obnoviť", key=f"renew_{idx}", use_container_width=True):
+                            ledger.renew(row['Meno'], row['Typ členstva'])
+                            st.rerun()
+                st.markdown("---")
+        
         # Štatistiky podľa typu členstva
         st.markdown("### 📊 Podľa typu členstva")
-        membership_counts = df['Typ členstva'].value_counts()
+        membership_counts = counters.membership_totals(day)
         
-        cols = st.columns(min(4, len(membership_counts)))
+        cols = st.columns(max(1, min(4, len(membership_counts))))
         for i, (membership, cnt) in enumerate(membership_counts.items()):
             with cols[i % 4]:
                 st.metric(membership, cnt)
@@ -967,18 +4092,93 @@ def trainer_view(worksheet):
             col1, col2 = st.columns([4, 1])
             with col1:
                 time_info = f" - {row[time_column]}" if time_column in row else ""
-                st.markdown(f"**{row['Meno']}** - {row['Typ členstva']}{time_info} ({row['Čas']})")
+                flag = f" {row['Poznámka']}" if str(row.get('Poznámka', '')).startswith("🚩") else ""
+                pending = f" _{row['Zápis']}_" if row['Zápis'] else ""
+                st.markdown(f"**{row['Meno']}** - {row['Typ členstva']}{time_info} ({row['Čas']}){flag}{pending}")
             with col2:
+                if row['Zápis'] == "⚠️ nezapísané":
+                    st.caption("📮 vyššie")
+                    continue
                 delete_key = f"delete_all_{idx}_{row['Čas']}"
                 if st.button("🗑️ Vymazať", key=delete_key, use_container_width=True):
                     training_time_val = row[time_column] if time_column in row else ""
-                    if delete_attendance(worksheet, row['Meno'], row['Čas'], row['Typ členstva'], training_time_val):
+                    if remove_attendance(worksheet, client, row['Meno'], row['Čas'], row['Typ členstva'], training_time_val):
                         st.success(f"✅ {row['Meno']} bol/a vymazaný/á")
                         st.rerun()
                     else:
                         st.error("❌ Chyba pri vymazávaní")
     else:
         st.info("Zatiaľ sa nikto neprihlásil.")
+    
+    st.markdown("---")
+    export_section(client, spreadsheet_id)
+    metrics_section()
+    profiles_section()
+
+
+def auto_checkin_params(client, spreadsheet_id, query_params):
+    """
+    Údaje pre okamžité prihlásenie z NFC/QR (auto=1 alebo členský kód) -
+    (meno, členstvo, čas, kód), alebo None, keď treba plnú stránku s formulárom.
+    """
+    if query_params.get("view", "participant") != "participant":
+        return None
+    member_token = query_params.get("m", "")
+    if member_token:
+        if query_params.get("auto", "1") != "1":
+            return None
+        member = resolve_member_token(client, spreadsheet_id, member_token)
+        if member is None:
+            return None
+        name, membership, training_time = member['name'], member['membership'], member['time']
+    else:
+        # S nastaveným kľúčom sa prihlasuje len podpísaným kódom - meno v URL
+        # si môže ktokoľvek prepísať, takže len predvyplní formulár
+        if query_params.get("auto", "0") != "1" or get_member_token_key():
+            return None
+        name = unquote(query_params.get("name", "")).strip()
+        membership = unquote(query_params.get("membership", ""))
+        training_time = unquote(query_params.get("time", ""))
+    if name and membership in MEMBERSHIP_SET and training_time in TRAINING_TIME_SET:
+        return name, membership, training_time, member_token
+    return None
+
+
+def auto_checkin_view(worksheet, client, name, membership, training_time, member_token):
+    """Okamžité prihlásenie - zápis do frontu a krátke potvrdenie (bez sidebaru, štýlov a formulára)."""
+    if not allow_checkin_attempt(name):
+        st.error("⚠️ Príliš veľa pokusov o prihlásenie. Skús to znova neskôr.")
+        return
+    if check_in(worksheet, client, name, membership, training_time):
+        st.success(f"🎉 {name}, úspešne prihlásený/á na tréning o {training_time}!")
+        if member_token and get_visit_log().is_ready():
+            st.markdown(f"[📅 Moje tréningy]({member_history_url(member_token)})")
+
+
+def inject_styles():
+    """Globálne štýly (okamžité prihlásenie s auto=1 ich nepotrebuje)."""
+    st.markdown("""
+    <style>
+        .big-number {
+            font-size: 72px;
+            font-weight: bold;
+            text-align: center;
+            color: #FF4B4B;
+        }
+        .subtitle {
+            font-size: 24px;
+            text-align: center;
+            color: #666;
+        }
+        .success-box {
+            padding: 20px;
+            border-radius: 10px;
+            background-color: #D4EDDA;
+            border: 1px solid #C3E6CB;
+            text-align: center;
+        }
+    </style>
+    """, unsafe_allow_html=True)
 
 
 def main():
@@ -1012,14 +4212,7 @@ def main():
         return
     
     # Kontrola spreadsheet_id - môže byť na top level alebo vnútri gcp_service_account
-    spreadsheet_id = None
-    
-    # Skús najprv top level
-    if "spreadsheet_id" in st.secrets:
-        spreadsheet_id = st.secrets["spreadsheet_id"]
-    # Ak nie je na top level, skús vnútri gcp_service_account
-    elif "gcp_service_account" in st.secrets and "spreadsheet_id" in st.secrets["gcp_service_account"]:
-        spreadsheet_id = st.secrets["gcp_service_account"]["spreadsheet_id"]
+    spreadsheet_id = get_spreadsheet_id()
     
     if not spreadsheet_id:
         st.error("⚠️ Chýba ID Google Sheetu v secrets!")
@@ -1041,18 +4234,52 @@ def main():
         st.error("⚠️ spreadsheet_id je prázdny alebo neplatný!")
         return
     
+    # Navigácia cez URL parametre
+    query_params = st.query_params
+    view = query_params.get("view", "participant")
+    
+    # NFC/QR (auto=1 alebo členský kód) - zahltenie sa odmietne ešte pred pripojením k Sheets
+    tag_request = view == "participant" and (query_params.get("auto", "0") == "1" or bool(query_params.get("m")))
+    client_limiter = get_rate_limiter("client")
+    if tag_request and client_limiter.is_limited(client_fingerprint()):
+        client_limiter.reject()
+        st.error("⚠️ Príliš veľa pokusov o prihlásenie. Skús to znova neskôr.")
+        return
+    
     # Pripojenie k Google Sheets
     client = get_google_sheets_client()
     if not client:
         return
     
-    worksheet = get_or_create_sheet(client, spreadsheet_id)
+    # Vlákna na pozadí sa spúšťajú raz za proces (ďalšie volania sú z cache) -
+    # aj proces, ktorý dostáva len NFC/QR prihlásenia, sa zahreje a pripraví hárky
+    start_warmup(client, spreadsheet_id)
+    start_sheet_scheduler(client, spreadsheet_id)
+    start_checkin_writer(client)
+    
+    # Pobočka z URL - dnešné zápisy idú do spreadsheetu pre (pobočka, rok)
+    router = get_shard_router(spreadsheet_id)
+    location = query_params.get("location", DEFAULT_LOCATION)
+    if location not in router.locations():
+        location = DEFAULT_LOCATION
+    
+    # NFC/QR s platnými údajmi - len dnešný hárok, zápis a potvrdenie, zvyšok stránky sa nevykresľuje
+    auto_checkin = auto_checkin_params(client, spreadsheet_id, query_params) if tag_request else None
+    
+    worksheet = get_or_create_sheet(client, router.spreadsheet_for(location, date.today().year))
     if not worksheet:
         return
     
-    # Navigácia cez URL parametre
-    query_params = st.query_params
-    view = query_params.get("view", "participant")
+    if auto_checkin:
+        auto_checkin_view(worksheet, client, *auto_checkin)
+        return
+    
+    inject_styles()
+    
+    # Obrazovka pri vchode - bez sidebaru a bez prihlásenia
+    if view == "display":
+        display_view(worksheet, location)
+        return
     
     # Sidebar navigácia
     with st.sidebar:
@@ -1084,6 +4311,8 @@ def main():
         
         st.markdown("---")
         st.markdown(f"📅 **{date.today().strftime('%d.%m.%Y')}**")
+        if len(router.locations()) > 1:
+            st.markdown(f"📍 **{location}**")
         
         # QR kód info
         st.markdown("---")
@@ -1094,6 +4323,7 @@ def main():
         - Účastník: `https://giantgym.streamlit.app/?view=participant`
         - Tréner: `https://giantgym.streamlit.app/?view=trainer`
         - Štatistiky: `https://giantgym.streamlit.app/?view=statistics`
+        - Obrazovka pri vchode: `https://giantgym.streamlit.app/?view=display`
         
         **Unikátne URL pre automatické prihlásenie:**
         
@@ -1111,14 +4341,20 @@ def main():
     
     # Zobrazenie správneho pohľadu
     if view == "trainer":
-        trainer_view(worksheet)
+        trainer_view(worksheet, client, spreadsheet_id)
     elif view == "statistics":
         statistics_view(client, spreadsheet_id)
     elif view == "wallet":
-        wallet_pass_view()
+        wallet_pass_view(client, spreadsheet_id)
+    elif view == "history":
+        member_history_view(client, spreadsheet_id, query_params)
     else:
-        participant_view(worksheet, query_params)
+        participant_view(worksheet, client, query_params)
 
 
 if __name__ == "__main__":
-    main()
+    # ?profile=1 - profilovanie aktuálneho behu, len pre prihláseného trénera
+    if st.query_params.get("profile") == "1" and check_trainer_auth():
+        profiled_main()
+    else:
+        main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Vyhľadanie a odstránenie duplicitných prihlásení v denných hárkoch.
+
+Duplicita = rovnaký deň, normalizované meno a čas tréningu a od
+predchádzajúceho záznamu série uplynulo najviac --window sekúnd (opakované
+načítanie s auto=1, dvojité ťuknutie). Prvý záznam série sa ponecháva.
+
+Postup v dvoch krokoch:
+1. python dedupe_history.py [--window 300]
+   Načíta všetky denné hárky (dávkovo), nájde duplicity jedným
+   vektorizovaným prechodom a zapíše report duplicates_report.csv.
+2. Skontroluj report - v stĺpci "Zmazať" zmeň "áno" na "nie" pri riadkoch,
+   ktoré sa mazať nemajú.
+3. python dedupe_history.py --apply duplicates_report.csv
+   Overí, že riadky v hárkoch sa medzitým nezmenili, a zmaže ich jedným
+   batch_update na spreadsheet (súvislé riadky ako jeden rozsah).
+"""
+
+import argparse
+
+import pandas as pd
+
+from sheets_cli import (
+    READ_QUOTA,
+    SHEET_HEADER,
+    WRITE_QUOTA,
+    QuotaLimiter,
+    all_spreadsheets,
+    chunked,
+    get_client,
+    is_day_sheet_title,
+    load_secrets,
+    normalize_name,
+    quote_range,
+)
+
+DEFAULT_WINDOW = 300
+REPORT_PATH = "duplicates_report.csv"
+READ_CHUNK = 100
+CONFIRMED = {"áno", "ano", "a", "yes", "y", "1"}
+
+REPORT_COLUMNS = [
+    'Spreadsheet', 'Pobočka', 'Hárok', 'Riadok', 'Čas', 'Meno', 'Typ členstva',
+    'Čas tréningu', 'Ponechaný riadok', 'Odstup (s)', 'Zmazať'
+]
+
+
+def day_sheet_ids(spreadsheet):
+    """Názov → sheetId pre denné hárky (jedno volanie)."""
+    metadata = spreadsheet.fetch_sheet_metadata({"fields": "sheets(properties(sheetId,title))"})
+    return {
+        sheet["properties"]["title"]: sheet["properties"]["sheetId"]
+        for sheet in metadata.get("sheets", [])
+        if is_day_sheet_title(sheet["properties"]["title"])
+    }
+
+
+def read_sheets(spreadsheet, titles, limiter):
+    """Hodnoty hárkov {názov: riadky} - po READ_CHUNK hárkov na požiadavku."""
+    values = {}
+    for batch in chunked(titles, READ_CHUNK):
+        limiter.wait()
+        response = spreadsheet.values_batch_get([quote_range(title) for title in batch])
+        for title, value_range in zip(batch, response.get("valueRanges", [])):
+            values[title] = value_range.get("values", [])
+    return values
+
+
+def load_history(client, spreadsheets, limiter):
+    """Všetky riadky denných hárkov ako jeden DataFrame s pozíciou riadku v hárku."""
+    records = []
+    for location, spreadsheet_id in spreadsheets:
+        spreadsheet = client.open_by_key(spreadsheet_id)
+        titles = sorted(day_sheet_ids(spreadsheet))
+        for title, rows in read_sheets(spreadsheet, titles, limiter).items():
+            for row_number, row in enumerate(rows[1:], start=2):
+                records.append([spreadsheet_id, location, title, row_number] + (row + [""] * 5)[:5])
+        print(f"  📄 {location}: {len(titles)} hárkov")
+    return pd.DataFrame(records, columns=['Spreadsheet', 'Pobočka', 'Hárok', 'Riadok'] + SHEET_HEADER)
+
+
+def find_duplicates(df, window):
+    """
+    Duplicitné riadky - jeden prechod: zoradenie podľa (spreadsheet, deň,
+    meno, čas tréningu, čas) a porovnanie so susedným riadkom.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    codes, uniques = pd.factorize(df['Meno'].astype(str))
+    keys = pd.Index(uniques, dtype=object).map(normalize_name).take(codes)
+    timestamps = df['Čas'].astype(str).str.strip()
+    timestamps = timestamps.where(timestamps.str.count(':') == 2, timestamps + ':00')
+    df = df.assign(
+        Kľúč=keys,
+        Sekundy=pd.to_timedelta(timestamps, errors='coerce').dt.total_seconds()
+    )
+    df = df[(df['Kľúč'] != "") & df['Sekundy'].notna()]
+
+    group = ['Spreadsheet', 'Hárok', 'Kľúč', 'Čas tréningu']
+    df = df.sort_values(group + ['Sekundy', 'Riadok'])
+    same_group = (df[group] == df[group].shift()).all(axis=1)
+    gap = df['Sekundy'].diff()
+    duplicate = same_group & (gap <= window)
+
+    df = df.assign(**{
+        'Ponechaný riadok': df['Riadok'].where(~duplicate).ffill().astype(int),
+        'Odstup (s)': gap.where(duplicate),
+        'Zmazať': "áno"
+    })
+    return df[duplicate][REPORT_COLUMNS].sort_values(['Spreadsheet', 'Hárok', 'Riadok'])
+
+
+def row_ranges(row_numbers):
+    """Súvislé rozsahy riadkov od konca [(prvý, posledný)] - mazanie odzadu nemení indexy."""
+    ranges = []
+    for row_number in sorted(row_numbers, reverse=True):
+        if ranges and ranges[-1][0] == row_number + 1:
+            ranges[-1] = (row_number, ranges[-1][1])
+        else:
+            ranges.append((row_number, row_number))
+    return ranges
+
+
+def apply_report(client, report_path, read_limiter, write_limiter):
+    """Zmazanie potvrdených riadkov z reportu - jeden batch_update na spreadsheet."""
+    report = pd.read_csv(report_path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    confirmed = report[report['Zmazať'].str.strip().str.lower().isin(CONFIRMED)]
+    deleted = skipped = 0
+    for spreadsheet_id, rows in confirmed.groupby('Spreadsheet'):
+        spreadsheet = client.open_by_key(spreadsheet_id)
+        sheet_ids = day_sheet_ids(spreadsheet)
+        current = read_sheets(spreadsheet, sorted(rows['Hárok'].unique()), read_limiter)
+
+        requests, spreadsheet_deleted = [], 0
+        for title, sheet_rows in rows.groupby('Hárok'):
+            values = current.get(title, [])
+            verified = []
+            for row in sheet_rows.to_dict('records'):
+                index = int(row['Riadok']) - 1
+                actual = (values[index] + [""] * 5)[:5] if index < len(values) else None
+                expected = [row[column] for column in SHEET_HEADER[:4]]
+                if actual is not None and actual[:4] == expected:
+                    verified.append(index + 1)
+                else:
+                    skipped += 1
+                    print(f"  ⚠️  {title} riadok {row['Riadok']} sa zmenil - preskočené")
+            for first, last in row_ranges(verified):
+                requests.append({
+                    "deleteDimension": {
+                        "range": {
+                            "sheetId": sheet_ids[title],
+                            "dimension": "ROWS",
+                            "startIndex": first - 1,
+                            "endIndex": last
+                        }
+                    }
+                })
+            spreadsheet_deleted += len(verified)
+
+        if requests:
+            write_limiter.wait()
+            spreadsheet.batch_update({"requests": requests})
+            print(f"  🗑️  {spreadsheet_id}: zmazaných {spreadsheet_deleted} riadkov")
+        deleted += spreadsheet_deleted
+    return deleted, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Duplicitné prihlásenia v denných hárkoch")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help="max. odstup duplicitného záznamu v sekundách (predvolené 300)")
+    parser.add_argument("--report", default=REPORT_PATH, help="cesta k reportu")
+    parser.add_argument("--apply", metavar="REPORT", help="zmazať potvrdené riadky z reportu")
+    args = parser.parse_args()
+
+    print("🧹 Duplicitné prihlásenia Giant Gym\n")
+    print("=" * 60)
+
+    secrets = load_secrets()
+    client = get_client(secrets)
+    read_limiter = QuotaLimiter(*READ_QUOTA)
+
+    if args.apply:
+        deleted, skipped = apply_report(client, args.apply, read_limiter, QuotaLimiter(*WRITE_QUOTA))
+        print(f"\n✅ Zmazané: {deleted}, preskočené: {skipped}")
+        print("ℹ️  V Štatistikách klikni na ♻️ Prepočítať z histórie (rebríček, agregáty, história členov).")
+    else:
+        history = load_history(client, all_spreadsheets(secrets), read_limiter)
+        duplicates = find_duplicates(history, args.window)
+        duplicates.to_csv(args.report, index=False, encoding='utf-8-sig')
+        print(f"\n🔍 Záznamov: {len(history)}, duplicít: {len(duplicates)} (okno {args.window} s)")
+        if len(duplicates):
+            print(f"📄 Report: {args.report} - skontroluj stĺpec 'Zmazať' a spusti:")
+            print(f"   python dedupe_history.py --apply {args.report}")
@@ -3,6 +3,9 @@
 Skript na generovanie unikátnych URL pre NFC tagy a QR kódy
 """
 
+import hashlib
+import hmac
+import os
 import urllib.parse
 
 # Typy členstva
@@ -22,6 +25,11 @@ TRAINING_TIMES = [
 
 BASE_URL = "https://giantgym.streamlit.app/?view=participant"
 
+# Krátke členské kódy (?m=...) - algoritmus musí zodpovedať app.py
+TOKEN_URL = "https://giantgym.streamlit.app/?m="
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+MEMBER_TOKEN_TAG_LENGTH = 5
+
 
 def create_gym_url(name, membership, time, auto=True):
     """
@@ -49,16 +57,57 @@ def create_gym_url(name, membership, time, auto=True):
     return f"{BASE_URL}&{query_string}"
 
 
+def base62_encode(number):
+    if number == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while number:
+        number, remainder = divmod(number, 62)
+        digits.append(BASE62_ALPHABET[remainder])
+    return "".join(reversed(digits))
+
+
+def create_member_token(member_id, key):
+    """Krátky podpísaný kód člena - base62 ID + HMAC podpis."""
+    digest = hmac.new(key.encode('utf-8'), str(member_id).encode('utf-8'), hashlib.sha256).digest()
+    tag = base62_encode(int.from_bytes(digest[:8], 'big') % 62 ** MEMBER_TOKEN_TAG_LENGTH)
+    tag = tag.rjust(MEMBER_TOKEN_TAG_LENGTH, BASE62_ALPHABET[0])
+    return base62_encode(int(member_id)) + tag
+
+
+def load_member_token_key():
+    """Kľúč pre členské kódy z MEMBER_TOKEN_KEY alebo .streamlit/secrets.toml."""
+    key = os.environ.get("MEMBER_TOKEN_KEY")
+    if key:
+        return key
+    try:
+        import tomllib
+        with open(os.path.join(".streamlit", "secrets.toml"), "rb") as f:
+            return tomllib.load(f).get("member_token_key")
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+def create_token_url(member_id, key, auto=True):
+    """Vytvorí krátke URL s členským kódom (údaje sa berú z hárku Členovia)."""
+    url = f"{TOKEN_URL}{create_member_token(member_id, key)}"
+    return url if auto else f"{url}&auto=0"
+
+
 def generate_from_csv(csv_file="members.csv"):
     """
     Generuje URL pre všetkých členov z CSV súboru.
     
     Formát CSV:
-    Meno,Typ členstva,Čas tréningu
-    Ján Novák,Mesačné členstvo,17:00
+    ID,Meno,Typ členstva,Čas tréningu
+    1,Ján Novák,Mesačné členstvo,17:00
+    
+    Ak má riadok ID a je nastavený kľúč (member_token_key), vytvorí sa
+    krátke URL s členským kódom, inak plné URL s menom.
     """
     import csv
     
+    key = load_member_token_key()
     try:
         with open(csv_file, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
@@ -68,8 +117,16 @@ def generate_from_csv(csv_file="members.csv"):
                 name = row.get('Meno', '').strip()
                 membership = row.get('Typ členstva', '').strip()
                 time = row.get('Čas tréningu', '').strip()
+                member_id = (row.get('ID') or '').strip()
                 
-                if name and membership and time:
+                if key and member_id.isdigit():
+                    url = create_token_url(int(member_id), key)
+                    results.append({
+                        'name': name or member_id,
+                        'url': url
+                    })
+                    print(f"✅ {name or member_id}: {url}")
+                elif name and membership and time:
                     url = create_gym_url(name, membership, time, auto=True)
                     results.append({
                         'name': name,
@@ -82,7 +139,7 @@ def generate_from_csv(csv_file="members.csv"):
             return results
     except FileNotFoundError:
         print(f"❌ Súbor {csv_file} nebol nájdený!")
-        print(f"Vytvor CSV súbor s hlavičkou: Meno,Typ členstva,Čas tréningu")
+        print(f"Vytvor CSV súbor s hlavičkou: ID,Meno,Typ členstva,Čas tréningu")
         return []
 
 
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Hromadný import historických prihlásení z CSV do denných hárkov.
+
+Formát CSV (hlavička povinná, Čas, Poznámka a Pobočka sú voliteľné):
+    Dátum,Čas,Meno,Typ členstva,Čas tréningu,Poznámka,Pobočka
+    2024-03-05,17:02:11,Ján Novák,Mesačné členstvo,17:00,,giantgym
+
+Postup:
+1. CSV sa číta priebežne, každý riadok sa overí voči katalógom členstiev
+   a časov tréningov. Neplatné riadky sa zapíšu do <csv>.rejected.csv.
+2. Platné riadky sa zoskupia podľa spreadsheetu (pobočka, rok) a dňa.
+3. Chýbajúce denné hárky sa vytvoria hromadne (jeden batch_update na dávku).
+4. Riadky sa zapíšu - do nových hárkov dávkovým values_batch_update, do
+   existujúcich cez values_append - všetko pod limitom kvóty zápisov.
+5. Po každej dávke sa uloží checkpoint (pri existujúcich hárkoch aj počet
+   už pripísaných riadkov dňa), takže prerušený import pokračuje tam, kde
+   skončil, a nič nezapíše dvakrát.
+
+Použitie:
+    python import_history.py historia.csv
+    python import_history.py historia.csv --dry-run   # len kontrola a súhrn
+"""
+
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from sheets_cli import (
+    DEFAULT_LOCATION,
+    MEMBERSHIP_TYPES,
+    SHEET_HEADER,
+    TRAINING_TIMES,
+    WRITE_QUOTA,
+    QuotaLimiter,
+    chunked,
+    day_sheet_requests,
+    get_client,
+    is_day_sheet_title,
+    load_secrets,
+    quote_range,
+    spreadsheet_for,
+)
+
+# Najviac riadkov v jednej zapisovacej požiadavke
+ROWS_PER_REQUEST = 5000
+
+# Najviac nových hárkov v jednom batch_update
+SHEETS_PER_REQUEST = 50
+
+MEMBERSHIP_SET = frozenset(MEMBERSHIP_TYPES)
+TRAINING_TIME_SET = frozenset(TRAINING_TIMES)
+DATE_FORMATS = ["%Y-%m-%d", "%d.%m.%Y", "%d. %m. %Y"]
+
+
+def parse_day(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def validate_row(row):
+    """Riadok hárku a deň, alebo (None, dôvod) pre neplatný riadok."""
+    day = parse_day(row.get('Dátum', ''))
+    name = (row.get('Meno') or '').strip()
+    membership = (row.get('Typ členstva') or '').strip()
+    training_time = (row.get('Čas tréningu') or '').strip()
+    timestamp = (row.get('Čas') or '').strip()
+    if day is None:
+        return None, "neplatný dátum"
+    if not name:
+        return None, "chýba meno"
+    if membership not in MEMBERSHIP_SET:
+        return None, f"neznámy typ členstva '{membership}'"
+    if training_time not in TRAINING_TIME_SET:
+        return None, f"neznámy čas tréningu '{training_time}'"
+    if timestamp:
+        try:
+            parsed = datetime.strptime(timestamp, "%H:%M:%S" if timestamp.count(":") == 2 else "%H:%M")
+        except ValueError:
+            return None, f"neplatný čas '{timestamp}'"
+        timestamp = parsed.strftime("%H:%M:%S")
+    sheet_row = [timestamp, name, membership, training_time, (row.get('Poznámka') or '').strip()]
+    return (day, sheet_row), None
+
+
+def read_csv(path, secrets):
+    """
+    Prúdové načítanie CSV - vráti {(spreadsheet_id, deň): [riadky]} a počet
+    odmietnutých riadkov (zapísané do <csv>.rejected.csv).
+    """
+    groups = {}
+    rejected = 0
+    rejected_path = os.path.splitext(path)[0] + ".rejected.csv"
+    with open(path, 'r', encoding='utf-8-sig', newline='') as source, \
+            open(rejected_path, 'w', encoding='utf-8-sig', newline='') as rejects:
+        reader = csv.DictReader(source)
+        writer = csv.writer(rejects)
+        writer.writerow(['Riadok', 'Dôvod'] + (reader.fieldnames or []))
+        for line_number, row in enumerate(reader, start=2):
+            result, problem = validate_row(row)
+            if result is None:
+                rejected += 1
+                writer.writerow([line_number, problem] + [row.get(column, '') for column in reader.fieldnames])
+                continue
+            day, sheet_row = result
+            location = (row.get('Pobočka') or '').strip() or DEFAULT_LOCATION
+            groups.setdefault((spreadsheet_for(secrets, location, day.year), day), []).append(sheet_row)
+    if not rejected:
+        os.remove(rejected_path)
+    return groups, rejected
+
+
+class Checkpoint:
+    """
+    Zoznam už zapísaných (spreadsheet, deň) a počet pripísaných riadkov
+    rozpísaných dní pre daný súbor - uložený atomicky po každej dávke.
+    """
+
+    def __init__(self, csv_path):
+        self.path = os.path.splitext(csv_path)[0] + ".checkpoint.json"
+        stat = os.stat(csv_path)
+        self.source = {"file": os.path.abspath(csv_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+        self.done = set()
+        self.offsets = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("source") == self.source:
+                self.done = set(data.get("done", []))
+                self.offsets = data.get("offsets", {})
+
+    @staticmethod
+    def key(spreadsheet_id, day):
+        return f"{spreadsheet_id}|{day.isoformat()}"
+
+    def is_done(self, spreadsheet_id, day):
+        return self.key(spreadsheet_id, day) in self.done
+
+    def offset(self, spreadsheet_id, day):
+        """Počet riadkov dňa, ktoré už boli pripísané do existujúceho hárku."""
+        return self.offsets.get(self.key(spreadsheet_id, day), 0)
+
+    def advance(self, spreadsheet_id, day, offset):
+        self.offsets[self.key(spreadsheet_id, day)] = offset
+        self._save()
+
+    def mark(self, keys):
+        for spreadsheet_id, day in keys:
+            self.done.add(self.key(spreadsheet_id, day))
+            self.offsets.pop(self.key(spreadsheet_id, day), None)
+        self._save()
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"source": self.source, "done": sorted(self.done), "offsets": self.offsets}, f)
+        os.replace(tmp_path, self.path)
+
+
+def import_spreadsheet(client, spreadsheet_id, days, checkpoint, limiter):
+    """Import dní ({deň: riadky}) do jedného spreadsheetu."""
+    spreadsheet = client.open_by_key(spreadsheet_id)
+    limiter.wait()
+    existing = {worksheet.title for worksheet in spreadsheet.worksheets() if is_day_sheet_title(worksheet.title)}
+    new_days = sorted(day for day in days if day.isoformat() not in existing)
+    old_days = sorted(day for day in days if day.isoformat() in existing)
+
+    # Nové hárky - hromadné vytvorenie (sheetId je odvodené z dátumu ako v app.py)
+    for batch in chunked(new_days, SHEETS_PER_REQUEST):
+        requests = []
+        for day in batch:
+            rows = days[day]
+            requests.extend(day_sheet_requests(day, int(day.strftime("%Y%m%d")), max(1000, len(rows) + 100)))
+        limiter.wait()
+        spreadsheet.batch_update({"requests": requests})
+        print(f"  🆕 Vytvorené hárky {batch[0]} … {batch[-1]} ({len(batch)})")
+
+    # Nové hárky sú prázdne - zapisuje sa od riadku 2, viac hárkov v jednej požiadavke
+    pending, pending_rows = [], 0
+    for day in new_days + [None]:
+        rows = days.get(day, [])
+        if pending and (day is None or pending_rows + len(rows) > ROWS_PER_REQUEST):
+            limiter.wait()
+            spreadsheet.values_batch_update({
+                "valueInputOption": "RAW",
+                "data": [{"range": quote_range(d.isoformat(), "A2"), "values": days[d]} for d in pending]
+            })
+            checkpoint.mark((spreadsheet_id, d) for d in pending)
+            print(f"  ✅ Zapísané {pending_rows} riadkov ({pending[0]} … {pending[-1]})")
+            pending, pending_rows = [], 0
+        if day is not None:
+            pending.append(day)
+            pending_rows += len(rows)
+
+    # Existujúce hárky - pripísanie za posledný riadok, po častiach; po každej
+    # časti sa uloží počet pripísaných riadkov, pokračuje sa od neho
+    for day in old_days:
+        offset = checkpoint.offset(spreadsheet_id, day)
+        for rows in chunked(days[day][offset:], ROWS_PER_REQUEST):
+            limiter.wait()
+            spreadsheet.values_append(
+                quote_range(day.isoformat(), "A1"),
+                {"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+                {"values": rows}
+            )
+            offset += len(rows)
+            checkpoint.advance(spreadsheet_id, day, offset)
+        checkpoint.mark([(spreadsheet_id, day)])
+        print(f"  ➕ {day}: pripísaných {len(days[day])} riadkov")
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    dry_run = "--dry-run" in sys.argv[1:]
+    if not args:
+        print("Použitie: python import_history.py <subor.csv> [--dry-run]")
+        print(f"Hlavička CSV: Dátum,{','.join(SHEET_HEADER)},Pobočka")
+        sys.exit(1)
+    csv_path = args[0]
+
+    print("📥 Import histórie Giant Gym\n")
+    print("=" * 60)
+
+    secrets = load_secrets()
+    groups, rejected = read_csv(csv_path, secrets)
+    total = sum(len(rows) for rows in groups.values())
+    print(f"\n📄 Platné riadky: {total} v {len(groups)} dňoch, odmietnuté: {rejected}")
+    if rejected:
+        print(f"⚠️  Odmietnuté riadky: {os.path.splitext(csv_path)[0]}.rejected.csv")
+
+    checkpoint = Checkpoint(csv_path)
+    by_spreadsheet = {}
+    for (spreadsheet_id, day), rows in groups.items():
+        if not checkpoint.is_done(spreadsheet_id, day):
+            by_spreadsheet.setdefault(spreadsheet_id, {})[day] = rows
+    skipped = len(groups) - sum(len(days) for days in by_spreadsheet.values())
+    if skipped:
+        print(f"⏭️  Preskočené dni z predchádzajúceho behu (checkpoint): {skipped}")
+
+    if dry_run:
+        print("\nℹ️  Nič sa nezapísalo (--dry-run)")
+        sys.exit(0)
+
+    client = get_client(secrets)
+    limiter = QuotaLimiter(*WRITE_QUOTA)
+    for spreadsheet_id, days in by_spreadsheet.items():
+        print(f"\n📄 Spreadsheet {spreadsheet_id}: {len(days)} dní")
+        import_spreadsheet(client, spreadsheet_id, days, checkpoint, limiter)
+
+    print("\n✅ Import dokončený")
+    print("ℹ️  V Štatistikách klikni na ♻️ Prepočítať z histórie, aby rebríček, agregáty")
+    print("   a história členov zahrnuli aj staršie dni.")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Jednorazová migrácia denných hárkov na aktuálnu schému (SHEET_HEADER).
+
+Staršie hárky majú stĺpec "Tréning" namiesto "Čas tréningu", prípadne
+chýba "Poznámka" alebo je iné poradie stĺpcov. Skript prejde všetky
+spreadsheety (hlavný aj [shards]) a pre každý:
+
+1. jedným volaním načíta zoznam hárkov s verziou schémy (developer metadata),
+2. hárky bez aktuálnej verzie načíta po dávkach (values_batch_get),
+3. prepíše hlavičku a stĺpce dávkovým values_batch_update,
+4. hárkom zapíše verziu schémy jedným batch_update.
+
+Už migrované hárky sa nečítajú, takže opakované spustenie je lacné.
+
+Použitie:
+    python migrate_schema.py            # migrácia
+    python migrate_schema.py --dry-run  # len výpis, čo by sa zmenilo
+"""
+
+import sys
+
+from sheets_cli import (
+    LEGACY_COLUMNS,
+    SCHEMA_METADATA_KEY,
+    SCHEMA_VERSION,
+    SHEET_HEADER,
+    all_spreadsheets,
+    chunked,
+    get_client,
+    is_day_sheet_title,
+    load_secrets,
+    quote_range,
+)
+
+# Počet hárkov v jednom čítacom/zapisovacom volaní
+READ_CHUNK = 100
+WRITE_CHUNK = 50
+
+METADATA_FIELDS = (
+    "sheets(properties(sheetId,title,gridProperties(columnCount)),"
+    "developerMetadata(metadataId,metadataKey,metadataValue))"
+)
+
+
+def pending_sheets(spreadsheet):
+    """Denné hárky, ktoré ešte nemajú aktuálnu verziu schémy."""
+    metadata = spreadsheet.fetch_sheet_metadata({"fields": METADATA_FIELDS})
+    pending = []
+    for sheet in metadata.get("sheets", []):
+        properties = sheet["properties"]
+        if not is_day_sheet_title(properties["title"]):
+            continue
+        schema_entries = [
+            entry for entry in sheet.get("developerMetadata", [])
+            if entry.get("metadataKey") == SCHEMA_METADATA_KEY
+        ]
+        if any(entry.get("metadataValue") == str(SCHEMA_VERSION) for entry in schema_entries):
+            continue
+        pending.append({
+            "sheet_id": properties["sheetId"],
+            "title": properties["title"],
+            "column_count": properties.get("gridProperties", {}).get("columnCount", 0),
+            "old_metadata": [entry["metadataId"] for entry in schema_entries]
+        })
+    return pending
+
+
+def migrate_values(values):
+    """
+    Hodnoty hárku v aktuálnej schéme, alebo None ak hárok už zodpovedá.
+
+    Stĺpce, ktoré SHEET_HEADER nepozná, sa nestratia - presunú sa za ňu.
+    Pôvodná šírka sa zachová (prázdnymi bunkami), aby nezostali staré hodnoty.
+    """
+    header = [LEGACY_COLUMNS.get(column.strip(), column.strip()) for column in (values[0] if values else [])]
+    extra = [column for column in header if column and column not in SHEET_HEADER]
+    new_header = SHEET_HEADER + extra
+    if header[:len(new_header)] == new_header and not any(header[len(new_header):]):
+        return None
+
+    positions = [header.index(column) if column in header else None for column in new_header]
+    width = max(len(header), len(new_header))
+    rows = [new_header + [""] * (width - len(new_header))]
+    for row in values[1:]:
+        migrated = [row[i] if i is not None and i < len(row) else "" for i in positions]
+        rows.append(migrated + [""] * (width - len(migrated)))
+    return rows
+
+
+def stamp_requests(sheet):
+    requests = [
+        {"deleteDeveloperMetadata": {"dataFilter": {"developerMetadataLookup": {"metadataId": metadata_id}}}}
+        for metadata_id in sheet["old_metadata"]
+    ]
+    requests.append({
+        "createDeveloperMetadata": {
+            "developerMetadata": {
+                "metadataKey": SCHEMA_METADATA_KEY,
+                "metadataValue": str(SCHEMA_VERSION),
+                "location": {"sheetId": sheet["sheet_id"]},
+                "visibility": "DOCUMENT"
+            }
+        }
+    })
+    return requests
+
+
+def migrate_spreadsheet(client, spreadsheet_id, dry_run=False):
+    """Migrácia jedného spreadsheetu - vráti (počet prepísaných, počet označených) hárkov."""
+    spreadsheet = client.open_by_key(spreadsheet_id)
+    pending = pending_sheets(spreadsheet)
+    if not pending:
+        return 0, 0
+
+    updates, resize_requests = [], []
+    for batch in chunked(pending, READ_CHUNK):
+        response = spreadsheet.values_batch_get([quote_range(sheet["title"]) for sheet in batch])
+        for sheet, value_range in zip(batch, response.get("valueRanges", [])):
+            rows = migrate_values(value_range.get("values", []))
+            if rows is None:
+                continue
+            width = len(rows[0])
+            updates.append({"range": quote_range(sheet["title"], "A1"), "values": rows})
+            if width > sheet["column_count"]:
+                resize_requests.append({
+                    "updateSheetProperties": {
+                        "properties": {"sheetId": sheet["sheet_id"], "gridProperties": {"columnCount": width}},
+                        "fields": "gridProperties.columnCount"
+                    }
+                })
+            print(f"  ✏️  {sheet['title']}: {' | '.join(rows[0])}")
+
+    if dry_run:
+        return len(updates), len(pending)
+
+    # Poradie: rozšírenie hárkov → zápis hodnôt → verzia schémy, aby prerušená
+    # migrácia nenechala označený hárok so starými dátami
+    for batch in chunked(resize_requests, WRITE_CHUNK):
+        spreadsheet.batch_update({"requests": batch})
+    for batch in chunked(updates, WRITE_CHUNK):
+        spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": batch})
+    stamps = [request for sheet in pending for request in stamp_requests(sheet)]
+    for batch in chunked(stamps, WRITE_CHUNK * 2):
+        spreadsheet.batch_update({"requests": batch})
+    return len(updates), len(pending)
+
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv[1:]
+
+    print("🗂️  Migrácia schémy denných hárkov Giant Gym\n")
+    print("=" * 60)
+
+    secrets = load_secrets()
+    client = get_client(secrets)
+
+    for location, spreadsheet_id in all_spreadsheets(secrets):
+        print(f"\n📄 {location} ({spreadsheet_id})")
+        rewritten, stamped = migrate_spreadsheet(client, spreadsheet_id, dry_run)
+        if not stamped:
+            print("  ✅ Všetky hárky majú aktuálnu schému")
+        elif dry_run:
+            print(f"  🔍 Na prepis: {rewritten}, na označenie verziou {SCHEMA_VERSION}: {stamped}")
+        else:
+            print(f"  ✅ Prepísané: {rewritten}, označené verziou {SCHEMA_VERSION}: {stamped}")
+
+    if dry_run:
+        print("\nℹ️  Nič sa nezapísalo (--dry-run)")
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Mesačný report pre majiteľa - predpočítaný mimo aplikácie (napr. z cronu).
+
+Report sa počíta z tréningov uzavretých dní, ktoré aplikácia udržiava
+v zdieľanom stave (data/shared.sqlite3), takže nečíta žiadne hárky. Výstup v
+data/reports/:
+    YYYY-MM.html  - report na čítanie/tlač
+    YYYY-MM.csv   - počty po dňoch a časoch tréningov
+    YYYY-MM.json  - kompaktný súhrn, ktorý zobrazujú Štatistiky v aplikácii
+
+Použitie:
+    python monthly_report.py                  # predchádzajúci (uzavretý) mesiac
+    python monthly_report.py --month 2026-09
+
+Cron (2. deň v mesiaci o 3:00, z adresára aplikácie):
+    0 3 2 * * cd /cesta/k/aplikacii && python monthly_report.py
+
+Mesiac, ktorého posledný deň aplikácia ešte neuzavrela, sa nezapíše;
+s --incomplete sa zapíše s označením neúplného mesiaca ("complete": false).
+"""
+
+import argparse
+import contextlib
+import html
+import json
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from sheets_cli import TRAINING_TIMES, load_secrets
+
+DATA_DIR = "data"
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+SHARED_STORE_PATH = os.path.join(DATA_DIR, "shared.sqlite3")
+TOP_MEMBERS = 10
+
+
+def slot_capacities():
+    """Kapacita časov tréningov zo secrets ([slot_capacity]), bez secrets žiadna."""
+    try:
+        return {slot: int(capacity) for slot, capacity in load_secrets().get("slot_capacity", {}).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def connect():
+    return contextlib.closing(sqlite3.connect(SHARED_STORE_PATH, timeout=10))
+
+
+def month_bounds(month):
+    """Prvý a posledný deň mesiaca YYYY-MM."""
+    first = datetime.strptime(month, "%Y-%m").date()
+    next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, next_month - timedelta(days=1)
+
+
+def closed_through():
+    """
+    Deň, po ktorý aplikácia úplne načítala uzavreté dni (prázdny reťazec = žiadny).
+    
+    Staršie stavy bez tejto značky majú len posledný deň s hárkom.
+    """
+    with connect() as db:
+        rows = dict(db.execute(
+            "SELECT key, value FROM state WHERE key IN ('closed_through', 'last_closed_day')"
+        ).fetchall())
+    return rows.get('closed_through') or rows.get('last_closed_day', "")
+
+
+def load_month(month):
+    """Uzavreté dni mesiaca, denné počty a tréningy členov po mesiacoch zo zdieľaného stavu."""
+    with connect() as db:
+        days = [day for (day,) in db.execute(
+            "SELECT day FROM closed_days WHERE substr(day, 1, 7) = ? ORDER BY day", (month,)
+        )]
+        daily = pd.DataFrame(db.execute(
+            "SELECT day, slot, membership, COUNT(*) FROM visits "
+            "WHERE day IN (SELECT day FROM closed_days) AND substr(day, 1, 7) = ? "
+            "GROUP BY day, slot, membership ORDER BY day",
+            (month,)
+        ).fetchall(), columns=['Dátum', 'Čas tréningu', 'Typ členstva', 'Počet'])
+        members = pd.DataFrame(db.execute(
+            "SELECT member, name, substr(day, 1, 7) AS month, COUNT(*), MAX(day) FROM visits "
+            "WHERE day IN (SELECT day FROM closed_days) GROUP BY member, month"
+        ).fetchall(), columns=['Kľúč', 'Meno', 'Mesiac', 'Tréningy', 'Posledný'])
+    return days, daily, members
+
+
+def build_report(month, days, daily, members, capacities, through):
+    """Súhrn mesiaca (dict pre JSON) a tabuľka po dňoch (pre CSV/HTML)."""
+    # Riadok pre každý otvorený deň, aj bez jediného prihlásenia
+    by_day = daily.pivot_table(
+        index='Dátum', columns='Čas tréningu', values='Počet', aggfunc='sum', fill_value=0
+    ).reindex(index=pd.Index(days, name='Dátum'), columns=TRAINING_TIMES, fill_value=0)
+    by_day['Spolu'] = by_day.sum(axis=1)
+    days = len(by_day)
+    total = int(by_day['Spolu'].sum())
+
+    slots = {}
+    for slot in TRAINING_TIMES:
+        slot_total = int(by_day[slot].sum())
+        average = slot_total / days if days else 0.0
+        capacity = capacities.get(slot)
+        slots[slot] = {
+            "total": slot_total,
+            "avg_per_day": round(average, 1),
+            "capacity": capacity,
+            "utilization": round(average / capacity, 3) if capacity else None
+        }
+
+    month_members = members[members['Mesiac'] == month]
+    first_months = members.groupby('Kľúč')['Mesiac'].min()
+    top = month_members.sort_values(['Tréningy', 'Meno'], ascending=[False, True]).head(TOP_MEMBERS)
+    mix = daily.groupby('Typ členstva')['Počet'].sum().sort_values(ascending=False)
+
+    summary = {
+        "month": month,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "complete": through >= month_bounds(month)[1].isoformat(),
+        "closed_through": through,
+        "total": total,
+        "days": days,
+        "avg_per_day": round(total / days, 1) if days else 0.0,
+        "members": int(month_members['Kľúč'].nunique()),
+        "new_members": int((first_months == month).sum()),
+        "top_members": [[row['Meno'], int(row['Tréningy'])] for row in top.to_dict('records')],
+        "slots": slots,
+        "membership_mix": {membership: int(count) for membership, count in mix.items()},
+        "files": {"html": f"{month}.html", "csv": f"{month}.csv"}
+    }
+    return summary, by_day
+
+
+def render_html(summary, by_day):
+    """Samostatná HTML stránka reportu."""
+    def table(rows, header):
+        head = "".join(f"<th>{html.escape(str(cell))}</th>" for cell in header)
+        body = "".join(
+            "<tr>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>" for row in rows
+        )
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    slot_rows = [
+        [slot, data["total"], data["avg_per_day"], data["capacity"] or "-",
+         f"{data['utilization']:.0%}" if data["utilization"] is not None else "-"]
+        for slot, data in summary["slots"].items()
+    ]
+    total = summary["total"] or 1
+    mix_rows = [[membership, count, f"{count / total:.0%}"] for membership, count in summary["membership_mix"].items()]
+    day_rows = [[day] + [int(value) for value in values] for day, values in by_day.iterrows()]
+    incomplete = "" if summary["complete"] else (
+        f"<p><b>⚠️ Neúplný mesiac - uzavreté dni len do {html.escape(summary['closed_through'] or '-')}.</b></p>"
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="sk">
+<head>
+<meta charset="utf-8">
+<title>Giant Gym - report {summary['month']}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; color: #222; }}
+table {{ border-collapse: collapse; margin: 0.5em 0 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: left; }}
+th {{ background: #eee; }}
+</style>
+</head>
+<body>
+<h1>🥊 Giant Gym - {summary['month']}</h1>
+{incomplete}
+<p>Tréningov: <b>{summary['total']}</b> za {summary['days']} dní (priemer {summary['avg_per_day']} na deň),
+členov: <b>{summary['members']}</b>, z toho nových: <b>{summary['new_members']}</b>.</p>
+<h2>Vyťaženosť časov tréningov</h2>
+{table(slot_rows, ['Čas', 'Spolu', 'Priemer na deň', 'Kapacita', 'Vyťaženosť'])}
+<h2>Najaktívnejší členovia</h2>
+{table([[i, name, count] for i, (name, count) in enumerate(summary['top_members'], 1)], ['#', 'Meno', 'Tréningy'])}
+<h2>Typy členstva</h2>
+{table(mix_rows, ['Typ členstva', 'Vstupy', 'Podiel'])}
+<h2>Po dňoch</h2>
+{table(day_rows, ['Dátum'] + list(by_day.columns))}
+<p><small>Vygenerované {summary['generated_at']}</small></p>
+</body>
+</html>
+"""
+
+
+def write_report(month, through):
+    days, daily, members = load_month(month)
+    summary, by_day = build_report(month, days, daily, members, slot_capacities(), through)
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    by_day.to_csv(os.path.join(REPORTS_DIR, f"{month}.csv"), encoding='utf-8-sig')
+    with open(os.path.join(REPORTS_DIR, f"{month}.html"), 'w', encoding='utf-8') as f:
+        f.write(render_html(summary, by_day))
+    # JSON ako posledný - aplikácia zobrazuje len reporty s hotovým súhrnom
+    tmp_path = os.path.join(REPORTS_DIR, f"{month}.json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(REPORTS_DIR, f"{month}.json"))
+    return summary
+
+
+if __name__ == "__main__":
+    previous_month = (date.today().replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    parser = argparse.ArgumentParser(description="Mesačný report z uzavretých dní v data/shared.sqlite3")
+    parser.add_argument("--month", default=previous_month, help="mesiac YYYY-MM (predvolene predchádzajúci)")
+    parser.add_argument("--incomplete", action="store_true", help="zapísať aj neúplný mesiac (s označením)")
+    args = parser.parse_args()
+
+    print(f"📑 Mesačný report Giant Gym - {args.month}\n")
+    print("=" * 60)
+
+    if not os.path.exists(SHARED_STORE_PATH):
+        print(f"❌ Chýba {SHARED_STORE_PATH} - spusti aplikáciu, aby načítala uzavreté dni.")
+        raise SystemExit(1)
+    through = closed_through()
+    last_day = month_bounds(args.month)[1].isoformat()
+    if through < last_day:
+        print(f"⚠️  Uzavreté dni sú len do {through or '-'}, mesiac končí {last_day}.")
+        if not args.incomplete:
+            print("❌ Report sa nezapíše - spusti ho po uzavretí mesiaca, prípadne s --incomplete.")
+            raise SystemExit(1)
+
+    summary = write_report(args.month, through)
+    print(f"\n✅ Tréningov: {summary['total']}, dní: {summary['days']}, členov: {summary['members']}")
+    print(f"📄 {REPORTS_DIR}/{args.month}.html, .csv, .json")
@@ -0,0 +1,176 @@
+"""
+Spoločné pomôcky pre skripty spúšťané mimo Streamlitu (cron, migrácie, import).
+
+Prihlasovacie údaje sa čítajú z .streamlit/secrets.toml, rovnako ako v app.py.
+Konštanty musia zodpovedať app.py.
+"""
+
+import os
+import re
+import time
+import tomllib
+import unicodedata
+from collections import deque
+
+import gspread
+from google.oauth2.service_account import Credentials
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+# Hlavička denného hárku a verzia schémy (ako v app.py)
+SHEET_HEADER = ['Čas', 'Meno', 'Typ členstva', 'Čas tréningu', 'Poznámka']
+SCHEMA_VERSION = 1
+SCHEMA_METADATA_KEY = "giantgym_schema"
+
+# Katalógy (ako v app.py)
+MEMBERSHIP_TYPES = [
+    "Skúšobný tréning",
+    "Mesačné členstvo",
+    "Jednorázový vstup",
+    "Ročné členstvo"
+]
+TRAINING_TIMES = [
+    "9:00",
+    "17:00",
+    "18:30"
+]
+
+# Kvóta Sheets API - počet požiadaviek za minútu (na používateľa 60 na čítanie aj zápis)
+READ_QUOTA = (50, 60)
+WRITE_QUOTA = (50, 60)
+
+# Pôvodné názvy stĺpcov → aktuálne
+LEGACY_COLUMNS = {'Tréning': 'Čas tréningu'}
+
+DEFAULT_LOCATION = "giantgym"
+
+DAY_SHEET_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def load_secrets(path=SECRETS_PATH):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def get_client(secrets):
+    """Pripojenie k Google Sheets pomocou service account zo secrets."""
+    credentials = Credentials.from_service_account_info(
+        secrets["gcp_service_account"],
+        scopes=[
+            "https://www.googleapis.com/auth/spreadsheets",
+            "https://www.googleapis.com/auth/drive"
+        ]
+    )
+    return gspread.authorize(credentials)
+
+
+def get_spreadsheet_id(secrets):
+    """ID hlavného spreadsheetu - na top level secrets alebo vnútri gcp_service_account."""
+    return secrets.get("spreadsheet_id") or secrets.get("gcp_service_account", {}).get("spreadsheet_id")
+
+
+def spreadsheet_for(secrets, location, year):
+    """Spreadsheet pre pobočku a rok podľa [shards] (ako ShardRouter v app.py)."""
+    by_year = {str(key): str(value) for key, value in secrets.get("shards", {}).get(location, {}).items()}
+    return by_year.get(str(year)) or by_year.get("default") or get_spreadsheet_id(secrets)
+
+
+def all_spreadsheets(secrets):
+    """Všetky spreadsheety (pobočka, id) - hlavný aj z [shards], každý raz."""
+    result, seen = [], set()
+    candidates = [(DEFAULT_LOCATION, get_spreadsheet_id(secrets))]
+    for location, by_year in secrets.get("shards", {}).items():
+        candidates.extend((location, str(sheet_id)) for sheet_id in by_year.values())
+    for location, sheet_id in candidates:
+        if sheet_id and sheet_id not in seen:
+            seen.add(sheet_id)
+            result.append((location, sheet_id))
+    return result
+
+
+def is_day_sheet_title(title):
+    return bool(DAY_SHEET_PATTERN.match(title))
+
+
+def normalize_name(name):
+    """Normalizované meno - malé písmená, bez diakritiky a nadbytočných medzier (ako v app.py)."""
+    without_accents = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii')
+    return " ".join(without_accents.lower().split())
+
+
+def quote_range(title, cells=""):
+    """A1 rozsah s názvom hárku v úvodzovkách (napr. '2024-01-05'!A1:E)."""
+    escaped = title.replace("'", "''")
+    return f"'{escaped}'!{cells}" if cells else f"'{escaped}'"
+
+
+def chunked(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def day_sheet_requests(day, sheet_id, row_count=1000):
+    """
+    Požiadavky batch_update na vytvorenie denného hárku s hlavičkou a verziou
+    schémy - rovnaké ako create_day_sheet v app.py.
+    """
+    header_cells = [
+        {
+            'userEnteredValue': {'stringValue': column},
+            'userEnteredFormat': {
+                'textFormat': {'bold': True},
+                'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
+            }
+        }
+        for column in SHEET_HEADER
+    ]
+    return [
+        {
+            'addSheet': {
+                'properties': {
+                    'sheetId': sheet_id,
+                    'title': day.isoformat(),
+                    'gridProperties': {'rowCount': row_count, 'columnCount': len(SHEET_HEADER)}
+                }
+            }
+        },
+        {
+            'updateCells': {
+                'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                'rows': [{'values': header_cells}],
+                'fields': 'userEnteredValue,userEnteredFormat(textFormat,backgroundColor)'
+            }
+        },
+        {
+            'createDeveloperMetadata': {
+                'developerMetadata': {
+                    'metadataKey': SCHEMA_METADATA_KEY,
+                    'metadataValue': str(SCHEMA_VERSION),
+                    'location': {'sheetId': sheet_id},
+                    'visibility': 'DOCUMENT'
+                }
+            }
+        }
+    ]
+
+
+class QuotaLimiter:
+    """
+    Posuvné okno požiadaviek na Sheets API - pred každou požiadavkou sa
+    zavolá wait(), ktorá v prípade potreby počká, kým sa v okne uvoľní miesto.
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._hits = deque()
+
+    def wait(self):
+        now = time.monotonic()
+        while self._hits and self._hits[0] <= now - self.window:
+            self._hits.popleft()
+        if len(self._hits) >= self.limit:
+            time.sleep(self._hits[0] + self.window - now)
+            self._hits.popleft()
+        self._hits.append(time.monotonic())